@@ -0,0 +1,216 @@
+"""
+Benchmarks of building and running networks, over network sizes and connectivities.
+
+Run from the repository:
+
+    python benchmarks/benchmark.py
+
+The cases build networks (neurons, connections one neuron at a time, hopfield
+weights), run a network of each neuron type, and run the sigmoid network again
+recording a single neuron (record_one, against the full recording of step_sigmoid)
+and evaluating observables on every step.
+
+Each case reports its speed (neurons built or steps run per second) and the peak
+memory it allocates, and compares the speed with baseline.json. --save-baseline
+stores the results as the new baseline. See --help for selecting sizes and cases
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+sys.path.insert(1, os.path.join(sys.path[0], '../..'))
+from netsy import network as n
+from netsy.factory import NeuronDict as nd
+from netsy.recorder import Recorder
+from netsy.observables import PopulationMean, PopulationVariance, Energy
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+ROW = "{0:<18} {1:>7} {2:>5} {3:>11} {4:<10} {5:>8}  {6}"
+
+NEURON_TYPES = ["sigmoid", "limsigmoid", "threshold", "binarynoise", "whitenoise"]
+
+# Neurons per step of a timed run, so that each run takes about the same time
+NEURON_STEPS = 2 * 10 ** 6
+MIN_STEPS, MAX_STEPS = 5, 500
+
+
+def create_network(size, connectivity, dense_max, ntype="sigmoid", seed=0):
+    """
+    A network of size neurons of one type. connectivity is "all" (all to all) or the
+    number of random connections each neuron listens to. Networks larger than
+    dense_max are sparse
+    """
+    net = n.Network(sparse=size > dense_max, seed=seed)
+    net.create_neuron_array(ntype=getattr(nd, ntype), size=size)
+    rng = np.random.default_rng(seed)
+
+    if connectivity == "all":
+        net.connections = rng.normal(0, 1 / np.sqrt(size), (size, size))
+        return net
+
+    rows = np.repeat(np.arange(size), connectivity)
+    cols = rng.integers(size, size=len(rows))
+    weights = rng.normal(0, 1 / np.sqrt(connectivity), len(rows))
+    if size > dense_max:
+        from scipy import sparse
+        net.connections = sparse.csr_matrix((weights, (rows, cols)), shape=(size, size))
+    else:
+        matrix = np.zeros((size, size))
+        matrix[rows, cols] = weights
+        net.connections = matrix
+    return net
+
+
+def build_neurons(size, dense_max, **kw):
+    net = n.Network(sparse=size > dense_max)
+    net.create_neuron_array(ntype=nd.sigmoid, size=size)
+
+
+def build_connections(size, connectivity, dense_max, **kw):
+    """ connectivity random connections per neuron, through set_connections """
+    net = n.Network(sparse=size > dense_max, seed=0)
+    neurons = net.create_neuron_array(ntype=nd.sigmoid, size=size)
+    rng = np.random.default_rng(0)
+    for neuron in neurons:
+        targets = rng.integers(size, size=connectivity).tolist()
+        net.set_connections(neuron, [neurons[i] for i in targets], 0.1)
+
+
+def build_hopfield(size, **kw):
+    net = n.Network(seed=0)
+    net.create_neuron_array(ntype=nd.sigmoid, size=size)
+    patterns = np.random.default_rng(0).random((5, size)) < 0.4
+    net.store_patterns(list(patterns))
+
+
+def steps_for(size):
+    return int(min(MAX_STEPS, max(MIN_STEPS, NEURON_STEPS // size)))
+
+
+def run_steps(size, connectivity, dense_max, ntype="sigmoid", steps=80, **run_kw):
+    """ Builds the network untimed, and returns a function that runs it """
+    net = create_network(size, connectivity, dense_max, ntype)
+    net.compile()
+    return lambda: net.run_and_get_results(steps=steps, **run_kw)
+
+
+def cases(sizes, connectivities, dense_max, max_connections, set_connections_max):
+    """ (name, size, connectivity, kind, func, count) for each benchmark """
+    for size in sizes:
+        yield "build_neurons", size, "-", "build", build_neurons, size
+        if size <= dense_max:
+            yield "build_hopfield", size, "all", "build", build_hopfield, size
+
+        for connectivity in connectivities:
+            count = size if connectivity == "all" else size * connectivity
+            if connectivity == "all" and size > dense_max or count > max_connections:
+                continue
+            if connectivity != "all" and size <= set_connections_max:
+                yield "build_connections", size, connectivity, "build", build_connections, size
+
+            steps = steps_for(size)
+            for ntype in NEURON_TYPES:
+                yield "step_" + ntype, size, connectivity, "run", (run_steps, dict(ntype=ntype, steps=steps)), steps
+            yield "record_one", size, connectivity, "run", (run_steps, dict(steps=steps, recorder=Recorder([0]))), steps
+            observables = {"mean": PopulationMean(), "variance": PopulationVariance(), "energy": Energy()}
+            yield "observables", size, connectivity, "run", (run_steps, dict(steps=steps, delta=1, observables=observables)), steps
+
+
+def measure(kind, func, size, connectivity, dense_max, repeat):
+    """
+    The shortest time of repeat calls, and the peak memory allocated by another call.
+    The networks of runs are built before the runs are timed, but count in the memory
+    """
+    def prepare():
+        if kind == "build":
+            return lambda: func(size=size, connectivity=connectivity, dense_max=dense_max)
+        run, kw = func
+        return run(size, connectivity, dense_max, **kw)
+
+    call = prepare()
+    elapsed = float("inf")
+    for i in range(repeat):
+        start = time.perf_counter()
+        call()
+        elapsed = min(elapsed, time.perf_counter() - start)
+
+    # The neurons and their network reference each other, so a network is only freed
+    # by the garbage collector
+    del call
+    gc.collect()
+
+    tracemalloc.start()
+    prepare()()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    gc.collect()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10,100,1000,10000,100000", help="network sizes")
+    parser.add_argument("--connectivity", default="all,10,100",
+                        help="'all' for all to all, or the number of connections per neuron")
+    parser.add_argument("--dense-max", type=int, default=4000, help="larger networks are sparse")
+    parser.add_argument("--max-connections", type=float, default=1e7, help="cases with more connections are skipped")
+    parser.add_argument("--set-connections-max", type=int, default=10000,
+                        help="connections are built one neuron at a time only up to this size")
+    parser.add_argument("--filter", default="", help="only the cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=3, help="the best of this many calls is reported")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--tolerance", type=float, default=1.3,
+                        help="a case is marked slower when the baseline is this many times faster")
+    parser.add_argument("--strict", action="store_true", help="exit with an error if any case is slower")
+    args = parser.parse_args()
+
+    sizes = [int(x) for x in args.sizes.split(",")]
+    connectivities = [x if x == "all" else int(x) for x in args.connectivity.split(",")]
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results, slower = {}, []
+    print(ROW.format("case", "size", "conn", "speed", "unit", "peak MB", "baseline"))
+    for name, size, connectivity, kind, func, count in cases(sizes, connectivities, args.dense_max,
+                                                             args.max_connections, args.set_connections_max):
+        if args.filter not in name:
+            continue
+
+        elapsed, peak = measure(kind, func, size, connectivity, args.dense_max, args.repeat)
+        key = "{0}/{1}/{2}".format(name, size, connectivity)
+        unit = "neurons/s" if kind == "build" else "steps/s"
+        results[key] = {"speed": count / elapsed, "unit": unit, "peak_mb": peak / 2 ** 20}
+
+        ratio = ""
+        if key in baseline:
+            speedup = results[key]["speed"] / baseline[key]["speed"]
+            ratio = "{0:.2f}x".format(speedup)
+            if speedup * args.tolerance < 1:
+                ratio += " slower"
+                slower.append(key)
+        print(ROW.format(name, size, connectivity, "{0:.4g}".format(results[key]["speed"]), unit,
+                         "{0:.1f}".format(results[key]["peak_mb"]), ratio))
+        sys.stdout.flush()
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=1, sort_keys=True)
+        print("saved the baseline to", args.baseline)
+    elif slower:
+        print("{0} cases are slower than the baseline".format(len(slower)))
+        if args.strict:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,748 @@
+import os
+import numpy as np
+
+# The number of strengths converted at once when the inputs are summed in a wider
+# type than the strengths are stored in
+UPCAST_ENTRIES = 2 ** 16
+
+
+def save_array(path, array):
+    """
+    Saves an array as a .npy file. The file is written aside and then replaces path,
+    so a copy of path that is memory mapped stays valid
+    """
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, array)
+    os.replace(path + ".tmp", path)
+
+
+def _pairs(rows, cols, value):
+    """
+    The (row, column) pairs addressed by numpy style indexing with rows and cols, and
+    the value of each pair
+    """
+    rows, cols, value = np.broadcast_arrays(np.asarray(rows, dtype=int), np.asarray(cols, dtype=int), value)
+    return np.array(rows).ravel(), np.array(cols).ravel(), np.array(value, dtype=float).ravel()
+
+
+def _last_pairs(rows, cols, value):
+    """ The pairs without repeats, each with its last value, as assigning them to a dense matrix does """
+    if len(rows) < 2:
+        return rows, cols, value
+    keys = (rows * (int(cols.max()) + 1) + cols)[::-1]
+    last = np.sort(len(rows) - 1 - np.unique(keys, return_index=True)[1])
+    return rows[last], cols[last], value[last]
+
+
+def _scipy_sparse():
+    # Imported when used, so that only sparse connections require scipy, and the
+    # connections can be copied and pickled
+    from scipy import sparse
+    return sparse
+
+
+def _dense(weights, shape):
+    """ weights, a scalar or a dense or sparse matrix, as a dense matrix of shape """
+    if hasattr(weights, "toarray"):
+        weights = weights.toarray()
+    return np.broadcast_to(np.asarray(weights, dtype=float), shape)
+
+
+def _dot(matrix, activations, accumulate=None):
+    """
+    matrix times activations (a vector or a trials x neurons matrix), summed in the type
+    of the strengths, or in accumulate if set. The strengths are then converted a few
+    rows at a time, so no wider copy of the whole matrix is made
+    """
+    if accumulate is None or accumulate == matrix.dtype:
+        return matrix.dot(activations.astype(matrix.dtype, copy=False).T).T
+
+    activations = activations.astype(accumulate, copy=False)
+    if hasattr(matrix, "tocsr"):
+        # scipy converts the strengths of sparse matrices by itself
+        return matrix.dot(activations.T).T
+
+    inputs = np.empty(activations.shape[:-1] + (matrix.shape[0],), dtype=accumulate)
+    rows = max(1, UPCAST_ENTRIES // max(1, matrix.shape[1]))
+    for start in range(0, matrix.shape[0], rows):
+        inputs[..., start:start + rows] = matrix[start:start + rows].astype(accumulate).dot(activations.T).T
+    return inputs
+
+
+class DenseConnections:
+    """
+    Connection strengths stored in a dense matrix. Row i holds the strengths of the
+    connections that neuron i listens to
+    """
+
+    sparse = False
+
+    def __init__(self, dtype=float, accumulate=None):
+        self.dtype = np.dtype(dtype)
+        self.accumulate = accumulate
+
+        # The strengths are stored in a flat buffer of capacity x capacity entries, row i
+        # at i * stride. While neurons are added the rows are capacity apart, and compact
+        # packs them size apart, in place, so that the runs get a contiguous matrix
+        self._buffer = np.zeros(0, dtype=self.dtype)
+        self._capacity = 0
+        self._stride = 0
+        self.size = 0
+
+        # Counts the changes, so that what was computed from the strengths can be redone
+        self.version = 0
+
+    @property
+    def matrix(self):
+        return self._buffer[:self.size * self._stride].reshape(self.size, self._stride)[:, :self.size]
+
+    @matrix.setter
+    def matrix(self, matrix):
+        matrix = np.array(matrix, dtype=self.dtype, ndmin=2)
+        self._buffer = matrix.reshape(-1)
+        self.size = self._capacity = self._stride = len(matrix)
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    def reserve(self, capacity):
+        """ Grows the buffer, keeping the existing strengths """
+        if capacity <= self.capacity:
+            return
+        buffer = np.zeros(capacity * capacity, dtype=self.dtype)
+        buffer[:self.size * capacity].reshape(self.size, capacity)[:, :self.size] = self.matrix
+        self._buffer, self._capacity, self._stride = buffer, capacity, capacity
+
+    def resize(self, size):
+        if size > self.capacity:
+            self.reserve(max(size, 2 * self.capacity))
+        elif size > self.size:
+            self._spread()
+        self.size = size
+        self.changed()
+
+    def compact(self):
+        """ Packs the rows next to each other, in place, so that the matrix is contiguous """
+        if self._stride == self.size:
+            return
+        for i in range(1, self.size):
+            self._buffer[i * self.size:(i + 1) * self.size] = self._buffer[i * self._stride:i * self._stride + self.size]
+        self._stride = self.size
+
+    def _spread(self):
+        """ Lays the rows capacity apart again, in place, with zeros after each row """
+        stride, capacity = self._stride, self.capacity
+        if stride == capacity:
+            return
+        for i in range(self.size - 1, -1, -1):
+            self._buffer[i * capacity:i * capacity + stride] = self._buffer[i * stride:(i + 1) * stride]
+            self._buffer[i * capacity + stride:(i + 1) * capacity] = 0
+        self._stride = capacity
+
+    def changed(self):
+        self.version += 1
+
+    def astype(self, dtype, accumulate=None):
+        """ Stores the strengths in dtype, and sums the inputs in accumulate if set """
+        self.dtype, self.accumulate = np.dtype(dtype), accumulate
+        self.matrix = self.matrix
+        self.changed()
+
+    def set(self, rows, cols, value):
+        self.matrix[rows, cols] = value
+        self.changed()
+
+    def set_block(self, rows, cols, weights):
+        """ Sets the strengths between the neurons rows and cols to weights, a scalar or a matrix """
+        self.matrix[np.ix_(rows, cols)] = _dense(weights, (len(rows), len(cols)))
+        self.changed()
+
+    def connected(self, rows, cols):
+        """ Whether any of the neurons cols sends to any of the neurons rows """
+        return bool(self.matrix[np.ix_(rows, cols)].any())
+
+    def subset(self, indices):
+        """ The connections among the neurons indices, as a copy """
+        connections = DenseConnections(self.dtype, self.accumulate)
+        connections.matrix = self.matrix[np.ix_(indices, indices)]
+        return connections
+
+    def save(self, path):
+        save_array(os.path.join(path, "connections.npy"), self.matrix)
+
+    def load(self, path):
+        """ Maps the saved matrix copy-on-write, it is read from the file only when used """
+        matrix = np.load(os.path.join(path, "connections.npy"), mmap_mode="c")
+        self._buffer = matrix.reshape(-1)
+        self.size = self._capacity = self._stride = len(matrix)
+        self.changed()
+
+    def add(self, rows, cols, value):
+        self.matrix[rows, cols] += value
+        self.changed()
+
+    def dot(self, activations):
+        """ The inputs of the neurons, for a vector or a trials x neurons matrix of activations """
+        return _dot(self.matrix, activations, self.accumulate)
+
+    def columns(self, cols):
+        """
+        A copy of the strengths of the connections from the neurons cols, stored by
+        column so that selecting some of its columns is fast
+        """
+        return np.asfortranarray(self.matrix[:, cols])
+
+
+class SparseConnections:
+    """
+    Connection strengths stored only for the existing connections, in compressed row
+    form. Changing existing connections writes their strengths in place, and new
+    connections are collected and merged in a single pass before the next run or
+    read. Requires scipy
+    """
+
+    sparse = True
+
+    def __init__(self, dtype=float, accumulate=None):
+        self.dtype = np.dtype(dtype)
+        self.accumulate = accumulate
+        self._compressed = self._sparse.csr_matrix((0, 0), dtype=self.dtype)
+
+        # The number of neurons. The compressed rows get this size when next used, so
+        # adding neurons one at a time does not rebuild them
+        self.size = 0
+
+        # The row * size + column of each stored strength, in order, to find the
+        # stored strengths of pairs. Kept until new connections are merged
+        self._keys = None
+
+        # The edits of connections that are not stored yet, as (rows, cols, values,
+        # add) in order, merged by compact()
+        self._pending = []
+        self._compressed_columns = None
+        self.version = 0
+
+    @property
+    def _sparse(self):
+        return _scipy_sparse()
+
+    @property
+    def matrix(self):
+        """ The strengths in compressed row form. Call changed() after changing them """
+        self.compact()
+        return self._compressed
+
+    @matrix.setter
+    def matrix(self, matrix):
+        self._compressed = self._sparse.csr_matrix(matrix, dtype=self.dtype)
+        self._compressed.sum_duplicates()
+        self.size = self._compressed.shape[0]
+        self._keys = None
+        self._pending = []
+
+    @property
+    def capacity(self):
+        """ Adding neurons never copies the strengths """
+        return float("inf")
+
+    def reserve(self, capacity):
+        # Only the row pointers grow with the neurons
+        pass
+
+    def resize(self, size):
+        self.size = size
+        self.changed()
+
+    def _fit(self):
+        """ Gives the compressed rows the size set by resize """
+        if self._compressed.shape[0] != self.size:
+            self._compressed.resize((self.size, self.size))
+            self._keys = None
+
+    def compact(self):
+        """ Merges the new connections into the compressed rows, ahead of the runs """
+        self._fit()
+        if not self._pending:
+            return
+
+        rows, cols, values, add = (np.concatenate(x) for x in zip(*self._pending))
+        self._pending = []
+        size = self.size
+        keys, position = np.unique(rows * size + cols, return_inverse=True)
+
+        # Each pair ends with the value of its last set, plus the values added after it
+        order = np.arange(len(rows))
+        last_set = np.full(len(keys), -1)
+        np.maximum.at(last_set, position[~add], order[~add])
+        strengths = np.zeros(len(keys))
+        strengths[position[last_set[position] == order]] = values[last_set[position] == order]
+        added = add & (order > last_set[position])
+        np.add.at(strengths, position[added], values[added])
+
+        stored = strengths != 0
+        new = self._sparse.csr_matrix((strengths[stored], (keys[stored] // size, keys[stored] % size)),
+                                      shape=(size, size), dtype=self.dtype)
+        self.matrix = self._compressed + new
+
+    def changed(self):
+        self._compressed_columns = None
+        self.version += 1
+
+    def astype(self, dtype, accumulate=None):
+        """ Stores the strengths in dtype, and sums the inputs in accumulate if set """
+        self.compact()
+        self._compressed = self._compressed.astype(dtype)
+        self.dtype, self.accumulate = np.dtype(dtype), accumulate
+        self.changed()
+
+    def _find(self, rows, cols):
+        """ The position of the stored strength of each pair, -1 for pairs that are not stored """
+        if self._keys is None:
+            counts = np.diff(self._compressed.indptr)
+            self._compressed.sort_indices()
+            self._keys = np.repeat(np.arange(len(counts)), counts) * self._compressed.shape[0] + self._compressed.indices
+
+        keys = rows * self._compressed.shape[0] + cols
+        position = np.searchsorted(self._keys, keys)
+        found = position < len(self._keys)
+        found[found] = self._keys[position[found]] == keys[found]
+        return np.where(found, position, -1)
+
+    def _edit(self, rows, cols, value, add):
+        rows, cols, value = _last_pairs(*_pairs(rows, cols, value))
+        self._fit()
+        position = self._find(rows, cols)
+        stored = position >= 0
+        if add:
+            np.add.at(self._compressed.data, position[stored], value[stored])
+        else:
+            self._compressed.data[position[stored]] = value[stored]
+        if (self._compressed.data[position[stored]] == 0).any():
+            # Connections set to 0 are removed, as when the rows are built
+            self._compressed.eliminate_zeros()
+            self._keys = None
+
+        if not stored.all():
+            new = ~stored
+            self._pending.append((rows[new], cols[new], value[new], np.full(new.sum(), add)))
+        self.changed()
+
+    def set(self, rows, cols, value):
+        self._edit(rows, cols, value, False)
+
+    def add(self, rows, cols, value):
+        self._edit(rows, cols, value, True)
+
+    def set_block(self, rows, cols, weights):
+        """
+        Sets the strengths between the neurons rows and cols to weights, a scalar or a
+        matrix. The block is replaced as a whole, without going through every pair
+        """
+        rows, cols = np.asarray(rows, dtype=int), np.asarray(cols, dtype=int)
+        if not hasattr(weights, "tocoo"):
+            weights = self._sparse.coo_matrix(_dense(weights, (len(rows), len(cols))))
+
+        self.compact()
+        current, weights = self._compressed.tocoo(), weights.tocoo()
+        keep = ~(np.isin(current.row, rows) & np.isin(current.col, cols))
+        data = np.concatenate([current.data[keep], weights.data])
+        coords = (np.concatenate([current.row[keep], rows[weights.row]]),
+                  np.concatenate([current.col[keep], cols[weights.col]]))
+        self.matrix = self._sparse.coo_matrix((data, coords), shape=current.shape)
+        self.changed()
+
+    def connected(self, rows, cols):
+        """ Whether any of the neurons cols sends to any of the neurons rows """
+        self.compact()
+        return self._compressed[np.asarray(rows, dtype=int)][:, np.asarray(cols, dtype=int)].nnz > 0
+
+    def in_place(self):
+        """
+        The compressed row strengths, for changing the strengths of existing connections
+        in place during a run. Call changed() once done
+        """
+        self.compact()
+        return self._compressed
+
+    def subset(self, indices):
+        """ The connections among the neurons indices, as a copy in compressed form for running """
+        self.compact()
+        connections = SparseConnections(self.dtype, self.accumulate)
+        connections.matrix = self._compressed[indices][:, indices]
+        return connections
+
+    def save(self, path):
+        self.compact()
+        for name in ("data", "indices", "indptr"):
+            save_array(os.path.join(path, "connections_{0}.npy".format(name)), getattr(self._compressed, name))
+
+    def load(self, path):
+        """
+        Maps the saved arrays, the strengths copy-on-write so that they can be changed
+        in place as the dense ones
+        """
+        arrays = [np.load(os.path.join(path, "connections_{0}.npy".format(name)), mmap_mode="c" if name == "data" else "r")
+                  for name in ("data", "indices", "indptr")]
+        self.size = len(arrays[2]) - 1
+        self._compressed = self._sparse.csr_matrix(tuple(arrays), shape=(self.size, self.size))
+        self._keys = None
+        self._pending = []
+        self.changed()
+
+    def dot(self, activations):
+        self.compact()
+        return _dot(self._compressed, activations, self.accumulate)
+
+    def columns(self, cols):
+        if self._compressed_columns is None:
+            self.compact()
+            self._compressed_columns = self._sparse.csc_matrix(self._compressed)
+        return self._compressed_columns[:, cols]
+
+
+class BlockConnections:
+    """
+    Connection strengths stored as blocks between groups of neurons. Each resize adds
+    the new neurons as a group, so every create_neuron_array is a group (and every
+    create_neuron a group of one). Only the blocks of groups that are connected are
+    stored, as dense arrays or as sparse matrices (requires scipy), and each block is
+    multiplied on its own, so layered networks skip the blocks of unconnected layers.
+
+    Editing single connections works as in the other connections but costs a lookup
+    of the block, so networks of many small groups are better stored whole
+    """
+
+    def __init__(self, sparse=False, dtype=float, accumulate=None):
+        self.sparse = sparse
+        self.dtype = np.dtype(dtype)
+        self.accumulate = accumulate
+
+        # Group g holds the neurons bounds[g] to bounds[g + 1]
+        self.bounds = [0]
+
+        # The stored blocks by (listening group, sending group). Sparse blocks are
+        # edited in dictionary-of-keys form, and the runs use a compressed row copy.
+        # Blocks that are set as a whole stay compressed until they are edited
+        self.blocks = {}
+        self._compressed = {}
+        self.version = 0
+
+    @property
+    def _sparse(self):
+        return _scipy_sparse()
+
+    @property
+    def size(self):
+        return self.bounds[-1]
+
+    @property
+    def capacity(self):
+        """ Adding neurons never copies the blocks """
+        return float("inf")
+
+    @property
+    def matrix(self):
+        """ All the strengths as a single matrix, a copy """
+        if not self.sparse:
+            matrix = np.zeros((self.size, self.size), dtype=self.dtype)
+            for (r, c), block in self.blocks.items():
+                matrix[self._range(r), self._range(c)] = block
+            return matrix
+
+        self.compact()
+        rows, cols, data = [], [], []
+        for (r, c), block in self._compressed.items():
+            block = block.tocoo()
+            rows.append(block.row + self.bounds[r])
+            cols.append(block.col + self.bounds[c])
+            data.append(block.data)
+        if not data:
+            return self._sparse.csr_matrix((self.size, self.size), dtype=self.dtype)
+        return self._sparse.csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                                       shape=(self.size, self.size))
+
+    @matrix.setter
+    def matrix(self, matrix):
+        """ Splits matrix into blocks, keeping the blocks that have connections """
+        size = matrix.shape[0]
+        if size > self.size:
+            self.bounds.append(size)
+
+        self.blocks = {}
+        rows, cols = matrix.nonzero()
+        groups = np.unique(np.stack([self._groups(rows), self._groups(cols)], axis=1), axis=0)
+        for r, c in groups.tolist():
+            block = matrix[self._range(r), self._range(c)]
+            self.blocks[r, c] = self._new_block(block)
+        self.changed()
+
+    def _range(self, group):
+        return slice(self.bounds[group], self.bounds[group + 1])
+
+    def _groups(self, indices):
+        return np.searchsorted(self.bounds, indices, side="right") - 1
+
+    def _new_block(self, values):
+        if not self.sparse:
+            return np.array(values.toarray() if hasattr(values, "toarray") else values, dtype=self.dtype)
+        return self._sparse.csr_matrix(values, dtype=self.dtype)
+
+    def reserve(self, capacity):
+        # Groups are stored apart, adding neurons does not copy the blocks
+        pass
+
+    def resize(self, size):
+        if size > self.size:
+            self.bounds.append(size)
+        self.changed()
+
+    def compact(self):
+        """ Builds the compressed row copy of sparse blocks ahead of the runs """
+        if self.sparse:
+            for key, block in self.blocks.items():
+                if key not in self._compressed:
+                    self._compressed[key] = block if block.format == "csr" else block.tocsr()
+
+    def changed(self):
+        self._compressed = {}
+        self.version += 1
+
+    def astype(self, dtype, accumulate=None):
+        """ Stores the strengths in dtype, and sums the inputs in accumulate if set """
+        self.blocks = {key: block.astype(dtype) for key, block in self.blocks.items()}
+        self.dtype, self.accumulate = np.dtype(dtype), accumulate
+        self.changed()
+
+    def _edit(self, rows, cols, value, add):
+        rows, cols, value = _last_pairs(*_pairs(rows, cols, value))
+        row_groups, col_groups = self._groups(rows), self._groups(cols)
+        keys = row_groups * len(self.bounds) + col_groups
+        for key in np.unique(keys).tolist():
+            r, c = divmod(key, len(self.bounds))
+            members = keys == key
+            local_rows, local_cols = rows[members] - self.bounds[r], cols[members] - self.bounds[c]
+            values = value[members]
+
+            block = self.blocks.get((r, c))
+            if block is None:
+                # Zero strengths between unconnected groups do not need a block
+                if not values.any():
+                    continue
+                shape = (self.bounds[r + 1] - self.bounds[r], self.bounds[c + 1] - self.bounds[c])
+                block = self.blocks[r, c] = self._new_block(np.zeros(shape))
+            if self.sparse and block.format != "dok":
+                block = self.blocks[r, c] = block.todok()
+
+            if add and self.sparse:
+                values = block[local_rows, local_cols].toarray().ravel() + values
+            elif add:
+                values = block[local_rows, local_cols] + values
+            block[local_rows, local_cols] = values
+        self.changed()
+
+    def set(self, rows, cols, value):
+        self._edit(rows, cols, value, add=False)
+
+    def add(self, rows, cols, value):
+        self._edit(rows, cols, value, add=True)
+
+    def set_block(self, rows, cols, weights):
+        """
+        Sets the strengths between the neurons rows and cols to weights, a scalar or a
+        len(rows) x len(cols) matrix (dense or sparse). When rows and cols are whole
+        groups weights are stored as their block as is, and zero weights remove the block
+        """
+        rows, cols = np.asarray(rows, dtype=int), np.asarray(cols, dtype=int)
+        r, c = self._group_of(rows), self._group_of(cols)
+        if r is None or c is None:
+            self.set(rows[:, None], cols[None, :], _dense(weights, (len(rows), len(cols))))
+            return
+
+        if not (weights.count_nonzero() if hasattr(weights, "count_nonzero") else np.any(weights)):
+            self.blocks.pop((r, c), None)
+        else:
+            self.blocks[r, c] = self._new_block(np.broadcast_to(weights, (len(rows), len(cols)))
+                                                if np.isscalar(weights) else weights)
+        self.changed()
+
+    def connected(self, rows, cols):
+        """ Whether any of the neurons cols sends to any of the neurons rows """
+        rows, cols = np.asarray(rows, dtype=int), np.asarray(cols, dtype=int)
+        row_groups, col_groups = self._groups(rows), self._groups(cols)
+        for (r, c), block in self.blocks.items():
+            local_rows = rows[row_groups == r] - self.bounds[r]
+            local_cols = cols[col_groups == c] - self.bounds[c]
+            if len(local_rows) and len(local_cols):
+                block = block[local_rows][:, local_cols]
+                if block.count_nonzero() if self.sparse else block.any():
+                    return True
+        return False
+
+    def _group_of(self, indices):
+        """ The group whose neurons are indices, None if they are not a whole group """
+        if not len(indices):
+            return None
+        group = self._groups(indices[0]).item()
+        if len(indices) != self.bounds[group + 1] - self.bounds[group] or indices[0] != self.bounds[group]:
+            return None
+        return group if (np.diff(indices) == 1).all() else None
+
+    def subset(self, indices):
+        """ The connections among the sorted neurons indices, as a copy with the same groups """
+        self.compact()
+        connections = BlockConnections(self.sparse, self.dtype, self.accumulate)
+        members = [np.flatnonzero(self._groups(indices) == g) for g in range(len(self.bounds) - 1)]
+        local = [indices[m] - self.bounds[g] for g, m in enumerate(members)]
+        connections.bounds = [0] + np.cumsum([len(m) for m in members]).tolist()
+
+        blocks = self._compressed if self.sparse else self.blocks
+        for (r, c), block in blocks.items():
+            if len(local[r]) and len(local[c]):
+                connections.blocks[r, c] = block[local[r]][:, local[c]]
+        return connections
+
+    def save(self, path):
+        self.compact()
+        save_array(os.path.join(path, "connections_bounds.npy"), np.array(self.bounds))
+        save_array(os.path.join(path, "connections_blocks.npy"), np.array(list(self.blocks), dtype=int).reshape(-1, 2))
+        for r, c in self.blocks:
+            name = os.path.join(path, "connections_{0}_{1}".format(r, c))
+            if not self.sparse:
+                save_array(name + ".npy", self.blocks[r, c])
+                continue
+            for part in ("data", "indices", "indptr"):
+                save_array("{0}_{1}.npy".format(name, part), getattr(self._compressed[r, c], part))
+
+    def load(self, path):
+        """ Maps the saved blocks as DenseConnections.load and SparseConnections.load do """
+        self.bounds = np.load(os.path.join(path, "connections_bounds.npy")).tolist()
+        self.blocks = {}
+        self.changed()
+        for r, c in np.load(os.path.join(path, "connections_blocks.npy")).tolist():
+            name = os.path.join(path, "connections_{0}_{1}".format(r, c))
+            if not self.sparse:
+                self.blocks[r, c] = np.load(name + ".npy", mmap_mode="c")
+                continue
+            arrays = [np.load("{0}_{1}.npy".format(name, part), mmap_mode="r") for part in ("data", "indices", "indptr")]
+            shape = (self.bounds[r + 1] - self.bounds[r], self.bounds[c + 1] - self.bounds[c])
+            self.blocks[r, c] = self._sparse.csr_matrix(tuple(arrays), shape=shape)
+
+    def dot(self, activations):
+        self.compact()
+        inputs = np.zeros(activations.shape[:-1] + (self.size,), dtype=self.dtype if self.accumulate is None else self.accumulate)
+        blocks = self._compressed if self.sparse else self.blocks
+        for (r, c), block in blocks.items():
+            inputs[..., self._range(r)] += _dot(block, activations[..., self._range(c)], self.accumulate)
+        return inputs
+
+    def columns(self, cols):
+        if self.sparse:
+            return self.matrix.tocsc()[:, cols]
+        return np.asfortranarray(self.matrix[:, cols])
+
+
+class EventInputs:
+    """
+    Computes the inputs of the neurons from the spiking neurons whose signal is not at
+    rest. A spiking neuron rests at a fixed signal (0 for threshold neurons, the low
+    end of the range for binary noise neurons) except on spikes, so the inputs are the
+    constant input of all of them resting, plus the columns of the few that are not.
+    The other neurons are added with a mat-vec restricted to their columns.
+
+    The connections are copied when the object is created, so it has to be recreated
+    when they change
+    """
+
+    def __init__(self, connections, rest):
+        """ rest holds the resting signal of each neuron, nan for non spiking neurons """
+        self.connections = connections
+        self.spiking = np.flatnonzero(~np.isnan(rest))
+        self.accumulate = connections.accumulate
+        self.rest = rest[self.spiking].astype(connections.dtype)
+        self.spiking_weights = connections.columns(self.spiking)
+
+        continuous = np.flatnonzero(np.isnan(rest))
+        self.continuous = continuous if len(continuous) else None
+        if self.continuous is not None:
+            self.continuous_weights = connections.columns(self.continuous)
+
+        self.rest_inputs = connections.dot(np.where(np.isnan(rest), 0, rest).astype(connections.dtype))
+
+    def __call__(self, activations):
+        inputs = np.broadcast_to(self.rest_inputs, activations.shape).copy()
+        if self.continuous is not None:
+            inputs += _dot(self.continuous_weights, activations[..., self.continuous], self.accumulate)
+
+        if not len(self.spiking):
+            return inputs
+
+        # A neuron that is not at rest in any of the trials is added to all of them
+        change = activations[..., self.spiking] - self.rest
+        firing = np.flatnonzero((change != 0).reshape(-1, len(self.spiking)).any(axis=0))
+        if len(firing):
+            inputs += _dot(self.spiking_weights[:, firing], change[..., firing], self.accumulate)
+        return inputs
+
+
+class SignalHistory:
+    """
+    The signals of the last depth steps, in a ring buffer allocated once: each step
+    overwrites the oldest signal. The signals before the first step are 0
+    """
+
+    def __init__(self, depth, shape, dtype=float):
+        self.signals = np.zeros((depth,) + tuple(shape), dtype=dtype)
+        self.step = 0
+
+    @property
+    def depth(self):
+        return len(self.signals)
+
+    def past(self, delay):
+        """ The signal of delay steps before the current step, 1 <= delay <= depth """
+        return self.signals[(self.step - delay) % self.depth]
+
+    def push(self, signal):
+        """ Stores the signal of the current step, and moves to the next step """
+        self.signals[self.step % self.depth] = signal
+        self.step += 1
+
+    def resized(self, depth, size):
+        """ A history of the given depth for size neurons, that keeps the recent signals of this one """
+        history = SignalHistory(depth, self.signals.shape[1:-1] + (size,), self.signals.dtype)
+        history.step = self.step
+        shared = min(size, self.signals.shape[-1])
+        for delay in range(1, min(depth, self.depth) + 1):
+            history.signals[(self.step - delay) % depth][..., :shared] = self.past(delay)[..., :shared]
+        return history
+
+    def expand(self, trials):
+        """ A history for trials copies of the network, each starting from these signals """
+        history = SignalHistory(self.depth, (trials,) + self.signals.shape[1:], self.signals.dtype)
+        history.signals[...] = self.signals[:, None]
+        history.step = self.step
+        return history
+
+
+class DelayedInputs:
+    """
+    Adds the inputs through delayed connections to those of inputs, the input function
+    of the connections without delay. The connections of each delay are a group that
+    is multiplied with the signals of that many steps before, kept in history (a
+    SignalHistory), so each delay costs one mat-vec per step. Each call is a step:
+    the signals it gets are stored in the history
+    """
+
+    def __init__(self, inputs, delayed, history):
+        """ delayed holds the connections of each delay, by delay """
+        self.inputs = inputs
+        self.delayed = sorted(delayed.items())
+        self.history = history
+
+    def __call__(self, activations):
+        inputs = self.inputs(activations)
+        for delay, connections in self.delayed:
+            inputs = inputs + connections.dot(self.history.past(delay))
+        self.history.push(activations)
+        return inputs
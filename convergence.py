@@ -0,0 +1,71 @@
+import numpy as np
+
+
+class Convergence:
+    """
+    A criterion for stopping a run early. The run converged when the activations are
+    within tol (largest difference of a single activation) of the activations period
+    steps before, on patience consecutive steps, for some period up to max_period.
+    With the default max_period=1 this detects fixed points, larger values detect
+    limit cycles as well.
+
+    After the run, step is the step on which the run converged (None if it did not)
+    and period the period found. In ensemble runs the run stops once all the trials
+    converged, and steps and periods hold the step and period of each trial (-1 and 0
+    for trials that did not converge)
+    """
+
+    def __init__(self, tol=1e-6, patience=10, max_period=1):
+        self.tol = tol
+        self.patience = patience
+        self.max_period = max_period
+        self.start()
+
+    def start(self):
+        self.step = None
+        self._history = None
+        self._recorded = 0
+
+    def _allocate(self, activations):
+        trials = activations.shape[:-1]
+        self._history = np.empty((self.max_period,) + activations.shape)
+        self._streak = np.zeros((self.max_period,) + trials, dtype=int)
+        self._steps = np.full(trials, -1)
+        self._periods = np.zeros(trials, dtype=int)
+
+    @property
+    def steps(self):
+        return self._steps.tolist()
+
+    @property
+    def periods(self):
+        return self._periods.tolist()
+
+    @property
+    def period(self):
+        return self._periods.max().item() if self.step is not None else None
+
+    def __call__(self, step, activations):
+        """ Called with the activations of each step, returns True when the run converged """
+        if self._history is None:
+            self._allocate(activations)
+
+        # The state of the lag p step is in the slot of the step p steps ago
+        lags = min(self._recorded, self.max_period)
+        if lags:
+            slots = (self._recorded - np.arange(1, lags + 1)) % self.max_period
+            close = np.abs(self._history[slots] - activations).max(axis=-1) < self.tol
+            self._streak[:lags] = np.where(close, self._streak[:lags] + 1, 0)
+
+        self._history[self._recorded % self.max_period] = activations
+        self._recorded += 1
+
+        settled = self._streak >= self.patience
+        found = (self._steps < 0) & settled.any(axis=0)
+        self._steps[found] = step
+        self._periods[found] = settled.argmax(axis=0)[found] + 1
+
+        if (self._steps >= 0).all():
+            self.step = step
+            return True
+        return False
@@ -1,4 +1,5 @@
 import matplotlib.pyplot as plt
+from .recorder import Recorder
 
 def show_all_in_graph(neurons, activations, show_labels=True, params=""):
 
@@ -8,7 +9,10 @@ def show_all_in_graph(neurons, activations, show_labels=True, params=""):
 	handles = []
 
 	for i in neurons:
-		handle, = plt.plot(activations[:, i.index], params, label=i.get_name())
+		if isinstance(activations, Recorder):
+			handle, = plt.plot(activations.steps, activations.get(i), params, label=i.get_name())
+		else:
+			handle, = plt.plot(activations[:, i.index], params, label=i.get_name())
 		handles.append(handle)
 
 	if show_labels:
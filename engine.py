@@ -0,0 +1,516 @@
+from . import neuron as n
+from .connectivity import EventInputs
+import copy
+import numpy as np
+
+# The largest number of steps whose random values are drawn together
+RANDOM_BLOCK_STEPS = 64
+
+# The dead neurons are dropped from the computation once they are at least this
+# fraction of the neurons that are computed
+COMPACT_FRACTION = 0.25
+
+
+class Population:
+    """
+    The state of all the neurons of a single type, stored as arrays. Each run
+    applies the same sequence as Neuron.run to the whole population at once.
+
+    The activation, input and refractory state can have a leading trials axis, to run
+    several trials of the population together. Ticks and lifespans are shared
+    """
+
+    # If set, the population needs one random value per living neuron per run
+    uses_random = False
+
+    # The type of the activations, inputs and parameters, see astype
+    dtype = np.dtype(float)
+
+    # The arrays that hold a value per neuron
+    parameters = ("low", "high", "lifespan", "refractory_time")
+    state = ("activation", "input", "ticks", "is_active", "in_refractory_period", "refractory_period_timer")
+
+    def __init__(self, neurons):
+        self.neurons = neurons
+        self.indices = np.array([x.index for x in neurons], dtype=int)
+
+        self.low = self._gather(lambda x: x.range[0])
+        self.high = self._gather(lambda x: x.range[1])
+        self.lifespan = self._gather(lambda x: x.lifespan or 0)
+        self.refractory_time = self._gather(lambda x: x.refractory_time)
+        self.load()
+
+    def _gather(self, func, dtype=float):
+        return np.array([func(x) for x in self.neurons], dtype=dtype)
+
+    def astype(self, dtype):
+        """ Stores the activations, inputs and parameters in dtype (the dtype of the network) """
+        self.dtype = np.dtype(dtype)
+        for name in self.parameters + self.state:
+            values = getattr(self, name)
+            if values.dtype.kind == "f":
+                setattr(self, name, values.astype(self.dtype))
+
+    def load(self):
+        """ Reads the dynamic state from the neuron objects """
+        self.activation = self._gather(lambda x: x.activation, dtype=self.dtype)
+        self.input = self._gather(lambda x: x.input, dtype=self.dtype)
+        self.ticks = self._gather(lambda x: x.ticks, dtype=int)
+        self.is_active = self._gather(lambda x: x.is_active, dtype=bool)
+        self.in_refractory_period = self._gather(lambda x: x.in_refractory_period, dtype=bool)
+        self.refractory_period_timer = self._gather(lambda x: x.refractory_period_timer, dtype=int)
+
+    def instance(self):
+        """ A population of the same neurons and parameters, in the current state of the neurons """
+        population = copy.copy(self)
+        population.load()
+        return population
+
+    def subset(self, members):
+        """ A population of the neurons in the mask members, with their parameters and state """
+        population = copy.copy(self)
+        population.neurons = [x for x, member in zip(self.neurons, members) if member]
+        for name in ("indices",) + self.parameters + self.state:
+            setattr(population, name, getattr(self, name)[..., members])
+        return population
+
+    def store(self):
+        """ Writes the dynamic state back to the neuron objects """
+        for i, neuron in enumerate(self.neurons):
+            neuron.activation = float(self.activation[i])
+            neuron.input = float(self.input[i])
+            neuron.ticks = int(self.ticks[i])
+            neuron.is_active = bool(self.is_active[i])
+            neuron.in_refractory_period = bool(self.in_refractory_period[i])
+            neuron.refractory_period_timer = int(self.refractory_period_timer[i])
+
+    def expand(self, trials):
+        """ Repeats the state of the neurons for each of the trials """
+        self.activation = np.tile(self.activation, (trials, 1))
+        self.input = np.tile(self.input, (trials, 1))
+        self.in_refractory_period = np.tile(self.in_refractory_period, (trials, 1))
+        self.refractory_period_timer = np.tile(self.refractory_period_timer, (trials, 1))
+
+    def add_input(self, inputs, receivers=None):
+        signal = inputs[..., self.indices].astype(self.dtype, copy=False)
+        if receivers is not None:
+            signal = np.where(receivers[self.indices], signal, 0)
+        self.input = self.input + signal
+
+    def _apply_input(self, live):
+        self.activation = np.where(live, self.activation + self.input, self.activation)
+        self.input = np.where(live, 0, self.input)
+
+    def _apply_range(self, live):
+        activation = np.where(self.activation > self.high, self.high, self.activation)
+        activation = np.where(activation < self.low, self.low, activation)
+        self.activation = np.where(live, activation, self.activation)
+
+    def _calc_output(self, live):
+        self._apply_input(live)
+        self._apply_range(live)
+
+    def _internal_processes(self, live):
+        self.activation = np.where(live, 0, self.activation)
+
+    def _refractory_period(self, live):
+        in_period = live & self.in_refractory_period
+        if not in_period.any():
+            return
+
+        ending = in_period & (self.refractory_period_timer > self.refractory_time)
+        continuing = in_period & ~ending
+        self.in_refractory_period = self.in_refractory_period & ~ending
+        self.refractory_period_timer = self.refractory_period_timer + continuing
+        self.activation = np.where(continuing, self.low, self.activation)
+
+    def get_signal(self, live, random_values=None):
+        return self.activation
+
+    def run(self, signal, random_values=None):
+        """
+        Same as calling run() on each neuron of the population. The signals are
+        written into signal at the indices of the neurons (in each trial)
+        """
+        live = self.is_active.copy()
+        self.ticks = self.ticks + live
+
+        dying = live & (self.lifespan > 0) & (self.ticks > self.lifespan)
+        if dying.any():
+            self.activation = np.where(dying, 0, self.activation)
+            self.is_active = self.is_active & ~dying
+
+        self._internal_processes(live)
+        self._refractory_period(live)
+        self._calc_output(live)
+
+        signal[..., self.indices] = np.where(live, self.get_signal(live, random_values), 0)
+
+
+class ThresholdPopulation(Population):
+
+    parameters = Population.parameters + ("threshold", "decay_coefficient")
+
+    def __init__(self, neurons):
+        super().__init__(neurons)
+        self.threshold = self._gather(lambda x: x.threshold)
+        self.decay_coefficient = self._gather(lambda x: x.decay_coefficient)
+
+    def get_signal(self, live, random_values=None):
+        return np.where(self.activation == n.SPIKE_SIZE, n.SPIKE_SIZE, 0)
+
+    def _apply_input(self, live):
+        free = live & ~self.in_refractory_period
+        self.activation = np.where(free, self.activation + self.input, self.activation)
+        self.input = np.where(free, 0, self.input)
+
+        fire = live & (self.activation >= self.threshold)
+        self.activation = np.where(fire, n.SPIKE_SIZE, self.activation)
+
+    def _internal_processes(self, live):
+        spike = live & (self.activation >= n.SPIKE_SIZE)
+        self.in_refractory_period = self.in_refractory_period | spike
+        self.refractory_period_timer = np.where(spike, 1, self.refractory_period_timer)
+        self.activation = np.where(spike, self.low, self.activation)
+
+        decayed = n.Utils.decay(self.activation, self.decay_coefficient)
+        self.activation = np.where(live, decayed, self.activation)
+
+
+class WhiteNoisePopulation(Population):
+
+    uses_random = True
+    parameters = Population.parameters + ("mean",)
+
+    def __init__(self, neurons):
+        super().__init__(neurons)
+        self.mean = self._gather(lambda x: x.mean)
+
+    def get_signal(self, live, random_values=None):
+        self.activation = np.where(live, random_values * self.mean * 2, self.activation)
+        return self.activation
+
+    def _internal_processes(self, live):
+        pass
+
+
+class BinaryNoisePopulation(ThresholdPopulation):
+
+    uses_random = True
+    parameters = ThresholdPopulation.parameters + ("p",)
+
+    def __init__(self, neurons):
+        super().__init__(neurons)
+        self.p = self._gather(lambda x: x.p)
+
+    def _apply_input(self, live):
+        pass
+
+    def get_signal(self, live, random_values=None):
+        spike = np.where(random_values < self.p, self.high, self.low)
+        self.activation = np.where(live, spike, self.activation)
+        return self.activation
+
+
+class SigmoidPopulation(Population):
+
+    parameters = Population.parameters + ("bias", "tanh_bias", "der_step")
+
+    def __init__(self, neurons):
+        super().__init__(neurons)
+        self.bias = self._gather(lambda x: x.bias)
+        self.tanh_bias = self._gather(lambda x: x.tanh_bias)
+        self.der_step = self._gather(lambda x: x.der_step)
+
+    def _apply_range(self, live):
+        pass
+
+    def _apply_input(self, live):
+        dif = self.bias + np.tanh(self.input + self.tanh_bias)
+        der = -self.activation + dif
+        self.activation = np.where(live, self.activation + der * self.der_step, self.activation)
+        self.input = np.where(live, 0, self.input)
+
+    def _internal_processes(self, live):
+        pass
+
+
+class LimitSigmoidPopulation(SigmoidPopulation):
+
+    parameters = SigmoidPopulation.parameters + ("tanh_beta",)
+
+    def __init__(self, neurons):
+        super().__init__(neurons)
+        self.tanh_beta = self._gather(lambda x: x.tanh_beta)
+
+    def _apply_input(self, live):
+        receiving = live & (self.input != 0)
+
+        # with the default infinite tanh_beta an input of exactly -tanh_bias is nan,
+        # as it is for a single neuron
+        with np.errstate(invalid="ignore"):
+            inpt_limit = np.tanh(self.tanh_beta * (self.input + self.tanh_bias))
+
+        der = -self.activation + inpt_limit
+        self.activation = np.where(receiving, self.activation + der * self.der_step, self.activation)
+        self.input = np.where(receiving, 0, self.input)
+
+
+# The population class that runs each neuron type. Only exact types are listed, so a
+# subclass that overrides the neuron behaviour is never run as its parent
+POPULATIONS = {
+    n.Neuron: Population,
+    n.ThresholdNeuron: ThresholdPopulation,
+    n.WhiteNoiseNeuron: WhiteNoisePopulation,
+    n.BinaryNoiseNeuron: BinaryNoisePopulation,
+    n.SigmoidNeuron: SigmoidPopulation,
+    n.LimitSigmoidNeuron: LimitSigmoidPopulation,
+}
+
+
+class Plan:
+    """
+    What the runs of a network use that only changes when the network is built: the
+    neurons of each type with their parameters (None if some type has no population),
+    the resting signals and the input function of event driven runs. Created by
+    Network.compile
+    """
+
+    def __init__(self, network):
+        neurons = network.neurons.tolist()
+        self.num_neurons = len(neurons)
+        self.version = network._connections.version
+
+        # Only the neuron objects can log
+        self.logging = any(x.log for x in neurons)
+
+        self.populations = None
+        if all(type(x) in POPULATIONS for x in neurons):
+            groups = {}
+            for neuron in neurons:
+                groups.setdefault(type(neuron), []).append(neuron)
+            self.populations = [POPULATIONS[ntype](members) for ntype, members in groups.items()]
+            for population in self.populations:
+                population.astype(network.dtype)
+
+        rest = [x.get_resting_signal() for x in neurons]
+        self.rest = np.array([np.nan if r is None else r for r in rest], dtype=float)
+
+        # The spiking neurons (those with a resting signal), whose signals of SPIKE_SIZE
+        # are spikes
+        self.spiking = ~np.isnan(self.rest)
+        self.event_inputs = None
+
+
+class ObjectEngine:
+    """
+    Runs the network by calling each of the neuron objects
+    """
+
+    def __init__(self, network, neurons=None):
+        self.network = network
+        self.neurons = network.neuron_list if neurons is None else neurons
+        network._init_activation()
+
+    @property
+    def signal(self):
+        return self.network.activations
+
+    def inputs(self, get_inputs):
+        return get_inputs(self.signal)
+
+    def add_input(self, inputs):
+        for neuron in self.neurons:
+            neuron.add_input(inputs[neuron.index])
+
+    def run(self):
+        self.network.run()
+
+    def active_count(self):
+        return sum(1 for x in self.network._neurons if x.is_active)
+
+    def sync(self):
+        pass
+
+
+class PopulationEngine:
+    """
+    Runs the network by updating all the neurons of a type together. The trajectories
+    are the same as those of ObjectEngine, including the random draws of the noise neurons.
+
+    If trials is set, that many copies of the network are run together. The signal then
+    has a row per trial, and the neuron objects are not updated. Each trial draws its
+    random values from its own generator, spawned from the network generator.
+
+    The random values of several steps are drawn together, as long as the noise neurons
+    that draw them stay alive and the run (of steps steps, if set) lasts.
+
+    Neurons that died (past their lifespan) only signal 0, so once enough of them died
+    they are dropped from the populations and from the connections used for the
+    inputs, which are then computed among the living neurons only (the same inputs up
+    to rounding). The signal keeps all the neurons. The input of a dropped neuron no
+    longer accumulates
+    """
+
+    def __init__(self, network, neurons=None, trials=None, steps=None, random_boundary=None):
+        self.network = network
+        self.trials = trials
+        self.steps = steps
+
+        # If set, blocks of random values do not span a multiple of this many steps, so
+        # the generator is not ahead of the run there (for checkpoints)
+        self.random_boundary = random_boundary
+        self._step = 0
+        self._block = np.empty((0, 0))
+        self._block_row = 0
+        self._trial_rngs = None if trials is None else network.rng.spawn(trials)
+
+        self.populations = [p.instance() for p in network._get_plan().populations]
+        self._random_populations = [p for p in self.populations if p.uses_random]
+
+        self.signal = network.activations if trials is None else np.empty((trials, network.num_neurons), dtype=network.dtype)
+        for population in self.populations:
+            self.signal[..., population.indices] = population.activation
+            if trials is not None:
+                population.expand(trials)
+
+        # Only these neurons get the network input, as in ObjectEngine
+        self.receivers = None
+        if neurons is not None:
+            self.receivers = np.zeros(len(network.neuron_list), dtype=bool)
+            self.receivers[network._neurons_to_indices(neurons)] = True
+
+        # The living neurons and their input function, once dead neurons were dropped
+        self._live = None
+        self._live_inputs = None
+        self._dropped = []
+        self._compactions = self._death_schedule()
+        if network._delayed or any(hook.changes_connections for hook in network.hooks):
+            self._compactions = set()
+
+    def _death_schedule(self):
+        """
+        The steps after which more of the neurons can be dropped: a neuron that dies in
+        a run signals 0 from the next run on
+        """
+        steps = set()
+        for population in self.populations:
+            if not population.is_active.all():
+                steps.add(1)
+            mortal = population.is_active & (population.lifespan > 0)
+            dying = np.floor(population.lifespan[mortal]) - population.ticks[mortal] + 1
+            steps.update((np.maximum(dying, 1) + 1).astype(int).tolist())
+        return steps
+
+    def _compact(self, dead):
+        """ Drops the neurons in the masks dead (one per population) if there are enough of them """
+        computed = sum(len(p.indices) for p in self.populations)
+        if sum(int(x.sum()) for x in dead) < COMPACT_FRACTION * computed:
+            return
+
+        populations = []
+        for population, members in zip(self.populations, dead):
+            if members.any():
+                self._dropped.append(population.subset(members))
+            if not members.all():
+                populations.append(population.subset(~members))
+        self.populations = populations
+        self._random_populations = [p for p in self.populations if p.uses_random]
+
+        self._live = np.sort(np.concatenate([p.indices for p in self.populations]))
+        connections = self.network._connections.subset(self._live)
+        if self.network.event_driven:
+            self._live_inputs = EventInputs(connections, self.network._get_plan().rest[self._live])
+        else:
+            self._live_inputs = connections.dot
+
+    def inputs(self, get_inputs):
+        """ The inputs of all the neurons, with get_inputs until dead neurons were dropped """
+        if self._live is None:
+            return get_inputs(self.signal)
+
+        inputs = np.zeros(self.signal.shape, dtype=self.signal.dtype)
+        inputs[..., self._live] = self._live_inputs(self.signal[..., self._live])
+        return inputs
+
+    def set_activations(self, activations):
+        """ Sets the activation and the current signal of all the neurons """
+        self.signal[...] = activations
+        for population in self.populations:
+            population.activation = self.signal[..., population.indices].copy()
+
+    def add_input(self, inputs):
+        for population in self.populations:
+            population.add_input(inputs, self.receivers)
+
+    def random(self, size):
+        """ Uniform random values of the given size for each trial, trials x size """
+        if self.trials is None:
+            return self.network.rng.random(size)
+        return np.stack([rng.random(size) for rng in self._trial_rngs])
+
+    def _block_length(self):
+        """ The number of steps during which the set of neurons that draw does not change """
+        length = RANDOM_BLOCK_STEPS
+        if self.steps is not None:
+            length = min(length, self.steps - self._step)
+        if self.random_boundary:
+            length = min(length, self.random_boundary - self._step % self.random_boundary)
+
+        for population in self._random_populations:
+            mortal = population.is_active & (population.lifespan > 0)
+            if mortal.any():
+                draws_left = np.floor(population.lifespan[mortal]) - population.ticks[mortal] + 1
+                length = min(length, int(draws_left.min()))
+        return max(length, 1)
+
+    def _draw_random_values(self):
+        """
+        One random value per living noise neuron, drawn in the order of the neuron
+        indices just like the neuron objects draw them in Network.run
+        """
+        if not self._random_populations:
+            return {}
+
+        shape = () if self.trials is None else (self.trials,)
+        live = [p.indices[p.is_active] for p in self._random_populations]
+        values = np.empty(shape + (sum(len(x) for x in live),), dtype=self.signal.dtype)
+        order = np.argsort(np.concatenate(live), kind="stable")
+
+        # Drawing a block of steps at once gives the same values as drawing each step
+        if self._block_row == len(self._block):
+            self._block = np.moveaxis(self.random((self._block_length(), values.shape[-1])), -2, 0)
+            self._block_row = 0
+        values[..., order] = self._block[self._block_row]
+        self._block_row += 1
+
+        draws, start = {}, 0
+        for population, indices in zip(self._random_populations, live):
+            population_values = np.zeros(shape + (len(population.indices),), dtype=self.signal.dtype)
+            population_values[..., population.is_active] = values[..., start:start + len(indices)]
+            draws[population] = population_values
+            start += len(indices)
+        return draws
+
+    def run(self):
+        # The neurons that are dead before this run signal 0 from it on
+        compacting = self._step + 1 in self._compactions
+        if compacting:
+            dead = [~p.is_active for p in self.populations]
+
+        draws = self._draw_random_values()
+        for population in self.populations:
+            population.run(self.signal, draws.get(population))
+        self._step += 1
+
+        if compacting and self.populations:
+            self._compact(dead)
+
+    def active_count(self):
+        return sum(int(p.is_active.sum()) for p in self.populations)
+
+    def sync(self):
+        if self.trials is not None:
+            return
+        for population in self.populations + self._dropped:
+            population.store()
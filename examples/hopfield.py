@@ -4,6 +4,7 @@ sys.path.insert(1, os.path.join(sys.path[0], '../..'))
 from netsy import network as n
 from netsy import display as d
 from netsy.factory import NeuronDict as nd
+from netsy.observables import PatternMatch
 import random
 
 NUM_PATTERNS = 6
@@ -27,20 +28,11 @@ connection_strength = 1 / NUM_PATTERNS
 patterns = []
 for i in range(NUM_PATTERNS):
 	active = [n for n in neurons if random.random() < PATTERN_PROB]
-	others = [n for n in neurons if n not in active]
 	patterns.append(active)
 
-	for n in neurons:
-		if n in active:
-			q = 1
-		else:
-			q = -1
-
-		n.increase_connection_strength(active, connection_strength * q)
-		n.increase_connection_strength(others, connection_strength * -q)
-
-## resets the connection of each neuron to itself to zero
-net.self_connections()
+# each pair of neurons is strengthened from both sides, hence the 2. The connection
+# of each neuron to itself is reset to zero
+net.store_patterns(patterns, strength=2 * connection_strength)
 
 # print([[x.index for x in pattern] for pattern in patterns])
 
@@ -61,28 +53,17 @@ pattern = patterns[-1]
 ## the parameter of the noise function is the size of the scatter
 net.apply_noise(0.5)
 
-# helper function that check if the pattern matches the activity
-def calc_distance_from_pattern(pattern, neurons):
-	active = [n for n in neurons if n.get_activation() > 0]
-	wrong = len([n for n in active if n not in pattern]) + \
-			len([n for n in pattern if n not in active])
-	score = 1 - wrong / len(neurons)
-	return score
-
-def calc_distance_from_all_patterns(neurons):
-	scores = [0] * len(patterns)
-	for i, p in enumerate(patterns):
-		scores[i] = calc_distance_from_pattern(p, neurons)
-
-	return scores
+# the similarity of the activity and each stored pattern: the fraction of neurons
+# that are active (positive) exactly where the pattern is
+similarity = PatternMatch()
 
 # first plot: the similarity of the activity and the patterns.
 # Does it converge to one pattern?
 plt.subplot(211)
-results, activations = net.run_and_get_results(func=calc_distance_from_all_patterns, steps=STEPS)
+results, activations = net.run_and_get_results(observables={"similarity": similarity}, steps=STEPS)
 handles = []
 for i, p in enumerate(patterns):
-	res = [x[i] for x in results]
+	res = results["similarity"][:, i]
 	handle, = plt.plot(res, "-o", label=i)
 	handles.append(handle)
 
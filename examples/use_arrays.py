@@ -6,8 +6,9 @@ from netsy import display as d
 from netsy.factory import NeuronDict as nd
 import random
 
-# initiate the network
-net = n.Network()
+# initiate the network. The connections are stored as blocks between the arrays of
+# neurons, so the layers that are not connected cost nothing
+net = n.Network(blocks=True)
 
 # add noies neurons to the network. The will not have synapses yet
 noise = net.create_neuron_array(name="noise", ntype=nd.whitenoise, mean=0.1, size=8, lifespan=50, range=[-0.1, 1])
@@ -25,18 +26,15 @@ net.set_lifespan(threshold[0:10], 20)
 net.set_lifespan(threshold[10:14], 30)
 
 # Create synapses. each threshold neuron will be connected to 
-# (will receive input from) all the noise neurons
-for neuron in threshold:
-	# To create randomness, each connection will be of random strength
-    neuron.listen_to(noise, "random")
+# (will receive input from) all the noise neurons.
+# To create randomness, each connection will be of random strength
+threshold.listen_to(noise, "random")
 
 # Create more neurons, this time sigmoid
 sigmoid = net.create_neuron_array(name="sig", ntype=nd.sigmoid, size=3, der_step=0.1, tanh_bias=-2)
 
 # Each one will be connected to a few noise neurons by random
-for neuron in sigmoid:
-	listento = [n for n in noise if random.random() > 0.7]
-	neuron.listen_to(listento, 10)
+sigmoid.listen_to(noise, [[10 if random.random() > 0.7 else 0 for x in noise] for y in sigmoid])
 
 # Select this neuron to print it's logs to console
 # sigmoid[-1].show_log()
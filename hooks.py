@@ -0,0 +1,93 @@
+from . import neuron as n
+import time
+import numpy as np
+
+
+class Hook:
+    """
+    Code that runs along with the runs of a network, added with Network.add_hook.
+
+    start is called when a run starts, before_step before the inputs of each step are
+    computed from the signals, after_step once the neurons were updated, and finish
+    when the run ends (also when it is stopped). The signals are a vector, or a
+    trials x neurons matrix in ensemble runs
+    """
+
+    # If set, the hook changes the connections during the runs, so the runs keep
+    # computing the inputs from the connections of the network (dead neurons are not
+    # dropped from them)
+    changes_connections = False
+
+    def start(self, network):
+        self.network = network
+
+    def before_step(self, step, signal):
+        pass
+
+    def after_step(self, step, signal):
+        pass
+
+    def finish(self):
+        pass
+
+
+class Stats:
+    """
+    Counters of the runs of a network, kept in Network.stats when the network is
+    created with stats=True. For each phase of a step it accumulates the wall time and
+    the number of calls:
+        inputs - computing the inputs from the signals (the mat-vec)
+        update - updating the neurons
+        record - recording the activations and evaluating the observables
+        callback - the func of run_and_get_results
+        hooks - the hooks of the network
+        checkpoint - saving checkpoints
+    For each step it keeps the number of spikes (signals of SPIKE_SIZE of the spiking
+    neurons, over all the trials) and the number of active neurons. The counters add
+    up over runs until reset
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.time = {}
+        self.calls = {}
+        self._spikes = []
+        self._active = []
+
+    def add(self, phase, start):
+        """ Adds the time since start (a time.perf_counter value) to phase, and returns the time now """
+        now = time.perf_counter()
+        self.time[phase] = self.time.get(phase, 0) + now - start
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        return now
+
+    def count(self, signal, active, spiking):
+        """ Counts a step, spiking is the mask of the spiking neurons (see engine.Plan) """
+        self._spikes.append(int(np.count_nonzero(signal[..., spiking] == n.SPIKE_SIZE)))
+        self._active.append(active)
+
+    @property
+    def steps(self):
+        return len(self._spikes)
+
+    @property
+    def spikes(self):
+        """ The number of spikes of each step """
+        return np.array(self._spikes, dtype=int)
+
+    @property
+    def active(self):
+        """ The number of active neurons in each step """
+        return np.array(self._active, dtype=int)
+
+    def summary(self):
+        """ A table of the time of each phase, in total and per step """
+        total = sum(self.time.values())
+        lines = ["{0:<12} {1:>10} {2:>8} {3:>14} {4:>7}".format("phase", "time (s)", "calls", "per step (us)", "share")]
+        for phase, seconds in sorted(self.time.items(), key=lambda item: -item[1]):
+            lines.append("{0:<12} {1:>10.4f} {2:>8} {3:>14.1f} {4:>6.1f}%".format(
+                phase, seconds, self.calls[phase], 1e6 * seconds / max(self.steps, 1), 100 * seconds / (total or 1)))
+        lines.append("{0} steps, {1} spikes".format(self.steps, int(self.spikes.sum())))
+        return "\n".join(lines)
@@ -0,0 +1,149 @@
+from . import neuron as n
+import numpy as np
+
+# Dormand-Prince 5(4) coefficients
+DP_C = [0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1]
+DP_A = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+DP_B = [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0]
+DP_ERROR = [
+    35 / 384 - 5179 / 57600, 0, 500 / 1113 - 7571 / 16695, 125 / 192 - 393 / 640,
+    -2187 / 6784 + 92097 / 339200, 11 / 84 - 187 / 2100, -1 / 40,
+]
+
+
+class SigmoidDynamics:
+    """
+    The continuous time dynamics of a network of sigmoid neurons. Each network step is
+    an Euler step of one time unit of
+        da/dt = der_step * (-a + bias + tanh(W.a + tanh_bias))
+    """
+
+    def __init__(self, network):
+        if any(type(x) is not n.SigmoidNeuron for x in network.neurons):
+            raise ValueError("only networks of SigmoidNeuron can be integrated")
+        if any(x.lifespan for x in network.neurons):
+            raise ValueError("neurons with a lifespan can not be integrated")
+        if network._delayed:
+            raise ValueError("networks with delays can not be integrated")
+
+        self.get_inputs = network._create_input_function()
+        self.bias = np.array([x.bias for x in network.neurons], dtype=float)
+        self.tanh_bias = np.array([x.tanh_bias for x in network.neurons], dtype=float)
+        self.der_step = np.array([x.der_step for x in network.neurons], dtype=float)
+
+        # The number of times the network inputs were computed
+        self.evaluations = 0
+
+    def __call__(self, t, activations):
+        self.evaluations += 1
+        dif = self.bias + np.tanh(self.get_inputs(activations) + self.tanh_bias)
+        return self.der_step * (-activations + dif)
+
+
+class _Grid:
+    """ Fills the output times with cubic Hermite interpolation of the integration steps """
+
+    def __init__(self, times, size):
+        self.times = np.asarray(times, dtype=float)
+        self.values = np.empty((len(self.times), size))
+        self._next = 0
+
+    def start(self, y):
+        self._next = np.searchsorted(self.times, 0, side="right")
+        self.values[:self._next] = y
+
+    def fill(self, t0, y0, f0, t1, y1, f1):
+        end = np.searchsorted(self.times, t1, side="right")
+        s = (self.times[self._next:end] - t0)[:, None] / (t1 - t0)
+        h = t1 - t0
+
+        self.values[self._next:end] = ((2 * s ** 3 - 3 * s ** 2 + 1) * y0 + (s ** 3 - 2 * s ** 2 + s) * h * f0
+                                       + (-2 * s ** 3 + 3 * s ** 2) * y1 + (s ** 3 - s ** 2) * h * f1)
+        self._next = end
+
+
+def euler_step(f, t, y, h, k1):
+    return y + h * k1
+
+
+def rk4_step(f, t, y, h, k1):
+    k2 = f(t + h / 2, y + h / 2 * k1)
+    k3 = f(t + h / 2, y + h / 2 * k2)
+    k4 = f(t + h, y + h * k3)
+    return y + h / 6 * (k1 + 2 * k2 + 2 * k3 + k4)
+
+
+FIXED_STEPS = {"euler": euler_step, "rk4": rk4_step}
+
+
+def _integrate_fixed(f, y, times, dt, step):
+    grid = _Grid(times, len(y))
+    t, end = 0.0, grid.times[-1]
+    k1 = f(t, y)
+    grid.start(y)
+
+    while t < end:
+        h = min(dt, end - t)
+        y_next = step(f, t, y, h, k1)
+        k_next = f(t + h, y_next)
+        grid.fill(t, y, k1, t + h, y_next, k_next)
+        t, y, k1 = t + h, y_next, k_next
+    return grid.values, y
+
+
+def _integrate_dormand_prince(f, y, times, dt, rtol, atol):
+    grid = _Grid(times, len(y))
+    t, end, h = 0.0, grid.times[-1], dt
+    k = [f(t, y)] + [None] * 6
+    grid.start(y)
+
+    while t < end:
+        h = min(h, end - t)
+        for i in range(1, 7):
+            k[i] = f(t + DP_C[i] * h, y + h * sum(a * k[j] for j, a in enumerate(DP_A[i]) if a))
+        y_next = y + h * sum(b * k[i] for i, b in enumerate(DP_B) if b)
+
+        error = h * sum(e * k[i] for i, e in enumerate(DP_ERROR) if e)
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_next))
+        norm = np.sqrt(np.mean((error / scale) ** 2))
+
+        if norm <= 1:
+            grid.fill(t, y, k[0], t + h, y_next, k[6])
+            t, y = t + h, y_next
+            # The last stage is the derivative at the new point
+            k[0] = k[6]
+
+        h *= min(5, max(0.2, 0.9 * norm ** -0.2)) if norm > 0 else 5
+        if h < 1e-12 * max(1, abs(t)):
+            raise RuntimeError("the integration step became too small at t={0}".format(t))
+    return grid.values, y
+
+
+def integrate(network, times, method="dopri5", dt=1, rtol=1e-6, atol=1e-9):
+    """
+    Integrates the dynamics of a network of sigmoid neurons (see SigmoidDynamics) from
+    the current activations. times are in network steps, increasing from 0 (the current
+    state). "euler" and "rk4" take fixed steps of dt, "dopri5" adapts its steps to the
+    tolerances starting from dt. "euler" with dt=1 is the same as running the network.
+
+    Returns the activations at times (times x neurons), the final activations and the
+    dynamics, whose evaluations count the computed network inputs
+    """
+    dynamics = SigmoidDynamics(network)
+    initial = np.array([x.get_activation() for x in network.neurons], dtype=float)
+
+    if method in FIXED_STEPS:
+        values, final = _integrate_fixed(dynamics, initial, times, dt, FIXED_STEPS[method])
+    elif method == "dopri5":
+        values, final = _integrate_dormand_prince(dynamics, initial, times, dt, rtol, atol)
+    else:
+        raise ValueError("unknown integration method {0}".format(method))
+    return values, final, dynamics
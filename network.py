@@ -1,16 +1,175 @@
 from . import neuron as n
+from .engine import ObjectEngine, PopulationEngine, Plan
+from .connectivity import DenseConnections, SparseConnections, BlockConnections, EventInputs, DelayedInputs, SignalHistory
+from .recorder import Recorder, to_indices
+from .observables import Sampler
+from .integrate import integrate as integrate_dynamics
+from .storage import save_network, load_network, Checkpoint
+from .hooks import Stats
+from . import wiring
 import random
+import itertools
+import copy
+import time
 import numpy as np
-import copy 
 
 class Network:
 
-    def __init__(self):
-        self.neurons = np.array([])
-        self.activations = np.array([])
-        self.connections = np.array([], ndmin=2, dtype=float)
+    def __init__(self, vectorized=True, sparse=False, event_driven=False, seed=None, stats=False, blocks=False, dtype=np.float64, accumulate=None):
+        # Activations are stored in a buffer that doubles in size when full, only the
+        # first num_neurons entries are used. The neurons are kept in a list, since the
+        # garbage collector does not look into object arrays and would never free the
+        # network and its neurons, which reference each other
+        self._neurons = []
         self.num_neurons = 0
 
+        # The type of the connection strengths, the activations and the recordings. With
+        # np.float32 the connections take half the memory and the inputs are computed
+        # faster, at some loss of precision (see precision.compare_precision). If
+        # accumulate is set (np.float64) the inputs are summed in that type
+        self.dtype = np.dtype(dtype)
+        self.accumulate = None if accumulate is None else np.dtype(accumulate)
+        self._activations = np.zeros(0, dtype=self.dtype)
+
+        # The generator of all the random values of the network: noise neurons, noise and
+        # random connections. If seed is not set it is drawn from the random module, so
+        # random.seed() also makes the network reproducible
+        self.rng = np.random.default_rng(random.getrandbits(64) if seed is None else seed)
+
+        # If set, runs update all the neurons of a type together instead of one at a time
+        self.vectorized = vectorized
+
+        # The patterns stored by store_patterns, a boolean mask over the neurons for each
+        self.patterns = np.zeros((0, 0), dtype=bool)
+
+        # If set, only existing connections are stored (scipy sparse matrix). Use this
+        # for large networks where each neuron listens to a few others
+        #
+        # If blocks is set, the connections are stored as blocks between the neuron arrays,
+        # and only the blocks of arrays that are connected are stored and multiplied. Use
+        # this for layered networks built with create_neuron_array and connect. With
+        # sparse the blocks are sparse
+        self._connections = self._new_connections(sparse, blocks)
+
+        # The connections with a delay, by delay in steps (see connect), stored as the
+        # connections without delay are. The runs multiply the connections of each
+        # delay with the signals of that many steps before, kept in the ring buffer
+        # self._history that lasts from run to run
+        self._delayed = {}
+        self._history = None
+
+        # If set, the inputs from spiking neurons (threshold and binary noise) are only
+        # computed from the neurons that spike, which is faster when spikes are sparse
+        self.event_driven = event_driven
+
+        # The plan the runs follow, created by compile() and discarded when the neurons,
+        # connections or lifespans change
+        self._plan = None
+
+        # If set, runs count the time of each phase of the steps, the spikes and the
+        # active neurons in self.stats (see hooks.Stats)
+        self.stats = Stats() if stats else None
+
+        # The hooks that are called during the runs, see add_hook
+        self.hooks = []
+
+    def _new_connections(self, sparse, blocks):
+        if blocks:
+            return BlockConnections(sparse, self.dtype, self.accumulate)
+        if sparse:
+            return SparseConnections(self.dtype, self.accumulate)
+        return DenseConnections(self.dtype, self.accumulate)
+
+    @property
+    def connections(self):
+        return self._connections.matrix
+
+    @property
+    def delays(self):
+        """ The delays (in steps) that have connections, besides 0 """
+        return sorted(self._delayed)
+
+    def delayed_connections(self, delay):
+        """ The strengths of the connections with the given delay, as the connections property """
+        if delay == 0:
+            return self.connections
+        if delay not in self._delayed:
+            raise ValueError("no connections with delay {0}".format(delay))
+        return self._delayed[delay].matrix
+
+    def _delay_group(self, delay):
+        """ The connections with the given delay in steps, created when first used """
+        if delay == 0:
+            return self._connections
+        if delay < 0 or int(delay) != delay:
+            raise ValueError("delays are whole numbers of steps, not {0}".format(delay))
+
+        delay = int(delay)
+        if delay not in self._delayed:
+            blocks = isinstance(self._connections, BlockConnections)
+            connections = self._new_connections(self._connections.sparse, blocks)
+            if blocks:
+                connections.bounds = list(self._connections.bounds)
+            else:
+                connections.reserve(self.capacity)
+                connections.resize(self.num_neurons)
+            self._delayed[delay] = connections
+        return self._delayed[delay]
+
+    def _set_block(self, rows, cols, weights, delay):
+        """ Sets the strengths of the block at delay, and removes its connections with other delays """
+        connections = self._delay_group(delay)
+        for other in [self._connections] + list(self._delayed.values()):
+            if other is not connections and other.connected(rows, cols):
+                other.set_block(rows, cols, 0)
+        connections.set_block(rows, cols, weights)
+
+    def _signal_history(self):
+        """ The ring buffer of the past signals, sized for the delays and the neurons """
+        depth = max(self._delayed)
+        if self._history is None:
+            self._history = SignalHistory(depth, (self.num_neurons,), self.dtype)
+        elif self._history.signals.shape != (depth, self.num_neurons):
+            self._history = self._history.resized(depth, self.num_neurons)
+        return self._history
+
+    @connections.setter
+    def connections(self, matrix):
+        self._connections.matrix = matrix
+        self._connections.changed()
+
+    @property
+    def neurons(self):
+        return np.array(self._neurons, dtype=object)
+
+    @property
+    def activations(self):
+        return self._activations[:self.num_neurons]
+
+    @activations.setter
+    def activations(self, values):
+        self._activations[:self.num_neurons] = values
+
+    @property
+    def capacity(self):
+        """ The number of neurons the network can hold before its storage is copied """
+        connections = [self._connections] + list(self._delayed.values())
+        return min([len(self._activations)] + [x.capacity for x in connections])
+
+    def reserve(self, num_neurons):
+        """
+        Makes room for num_neurons neurons in total. Creating neurons up to this number
+        will not copy the activations or connections
+        """
+        if num_neurons > len(self._activations):
+            activations = np.zeros(num_neurons, dtype=self.dtype)
+            activations[:self.num_neurons] = self.activations
+            self._activations = activations
+
+        self._connections.reserve(num_neurons)
+        for connections in self._delayed.values():
+            connections.reserve(num_neurons)
+
     def _neurons_to_indices(self, neuron_array):
         if not isinstance(neuron_array, list) and not isinstance(neuron_array, np.ndarray):
             neuron_array = [neuron_array]
@@ -18,26 +177,137 @@ class Network:
 
 
     def _create_neuron_in_array(self, ntype, **kwargs):
-        new_index = len(self.neurons)
+        new_index = self.num_neurons
         neuron = ntype(network=self, index=new_index, **kwargs)
-        self.neurons = np.append(self.neurons, neuron)
+        # The connections grow on their own in _resize_connections
+        if new_index == len(self._activations):
+            self.reserve(max(1, 2 * len(self._activations)))
+
+        self._neurons.append(neuron)
+        self._activations[new_index] = neuron.get_activation()
+        self.num_neurons += 1
+        self.invalidate()
         return neuron
 
-    def _add_neurons_to_connection_matrix(self, num_neurons):
-        self.num_neurons += num_neurons
-        self.connections = np.resize(self.connections, (self.num_neurons, self.num_neurons))
-
     def _init_activation(self):
         self.activations = [i.get_activation() for i in self.neurons]
 
+    def _get_inputs(self, activations):
+        return self._connections.dot(activations)
+
+    def compile(self):
+        """
+        Freezes the network for running: groups the neurons by type with their parameters
+        as arrays, and stores the connections contiguously. Runs compile the network
+        when needed, and creating neurons, changing connections or lifespans discards
+        the plan. Other changes to the parameters of the neurons take effect after
+        calling compile() again
+        """
+        self._connections.compact()
+        for connections in self._delayed.values():
+            connections.compact()
+        self._plan = Plan(self)
+        return self._plan
+
+    def astype(self, dtype, accumulate=None):
+        """
+        A copy of the network, in the same state, whose connection strengths and
+        activations are stored in dtype (and the inputs summed in accumulate, if set)
+        """
+        network = copy.deepcopy(self)
+        network.dtype = np.dtype(dtype)
+        network.accumulate = None if accumulate is None else np.dtype(accumulate)
+        network._activations = network._activations.astype(network.dtype)
+        network._connections.astype(network.dtype, network.accumulate)
+        for connections in network._delayed.values():
+            connections.astype(network.dtype, network.accumulate)
+        if network._history is not None:
+            network._history.signals = network._history.signals.astype(network.dtype)
+        network.invalidate()
+        return network
+
+    def invalidate(self):
+        """ Discards the compiled plan, the next run compiles the network again """
+        self._plan = None
+
+    def _get_plan(self):
+        if self._plan is None or self._plan.version != self._connections.version:
+            self.compile()
+        return self._plan
+
+    def _create_input_function(self, shape=None):
+        """
+        The function that computes the inputs of a step from its signals. With delays,
+        each call is a step of a run, whose signals have shape (those of the network
+        if not set, trials x neurons in ensemble runs)
+        """
+        inputs = self._get_inputs
+        if self.event_driven:
+            plan = self._get_plan()
+            if plan.event_inputs is None:
+                plan.event_inputs = EventInputs(self._connections, plan.rest)
+            inputs = plan.event_inputs
+
+        if not self._delayed:
+            return inputs
+        history = self._signal_history()
+        if shape is not None and len(shape) > 1:
+            history = history.expand(shape[0])
+        return DelayedInputs(inputs, self._delayed, history)
+
+    def _create_engine(self, neurons=None, steps=None, random_boundary=None):
+        plan = self._get_plan()
+        if self.vectorized and not plan.logging and plan.populations is not None:
+            return PopulationEngine(self, neurons, steps=steps, random_boundary=random_boundary)
+        return ObjectEngine(self, neurons)
+
+    def add_hook(self, hook):
+        """ Calls hook (a hooks.Hook) before and after each step of the runs of the network """
+        self.hooks.append(hook)
+        return hook
+
+    def remove_hook(self, hook):
+        self.hooks.remove(hook)
+
+    def save(self, path):
+        """ Saves the network and its state into the directory path (see storage.py) """
+        save_network(self, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a network saved with save. The arrays are memory mapped, and the
+        connections are only read from the file when they are used
+        """
+        return load_network(cls, path)
+
+    @classmethod
+    def resume(cls, path):
+        """
+        Resumes the run of run_and_get_activations whose checkpoints were saved in path
+        (see storage.Checkpoint) from the last checkpoint, and keeps saving checkpoints.
+        Returns the network and the activations of the whole run
+        """
+        network, run, recorded = Checkpoint.load(cls, path)
+        neurons = None if run["neurons"] is None else network.neurons[run["neurons"]].tolist()
+        recorder = Recorder(run["record"], run["record_every"], run["record_path"])
+        checkpoint = Checkpoint(path, run["every"])
+        checkpoint.resumed(run, network)
+        activations = network._run_and_execute(neurons, steps=run["steps"], recorder=recorder,
+                                               checkpoint=checkpoint, resume=(run["step"], run["rows"], recorded))
+        return network, activations
+
 
     def create_neuron(self, ntype=None, **kwargs):
         neuron = self._create_neuron_in_array(ntype, **kwargs)
-        self._add_neurons_to_connection_matrix(1)
+        self._resize_connections()
         return neuron
 
 
     def create_neuron_array(self, size=3, ntype=None, **kwargs):
+        if self.num_neurons + size > self.capacity:
+            self.reserve(max(self.num_neurons + size, 2 * self.capacity))
+
         neurons = []
         name = None
         if "name" in kwargs:
@@ -49,21 +319,28 @@ class Network:
             neuron = self._create_neuron_in_array(ntype, **kwargs)
             neurons.append(neuron)
 
-        self._add_neurons_to_connection_matrix(size)
-        return neurons
+        self._resize_connections()
+        return n.NeuronArray(self, neurons)
+
+    def _resize_connections(self):
+        self._connections.resize(self.num_neurons)
+        for connections in self._delayed.values():
+            connections.resize(self.num_neurons)
 
 
     def set_activation(self, index, value):
-        try:
-            self.activations[index] = value
-        except IndexError:
-            self._init_activation()
-            self.activations[index] = value
+        self.activations[index] = value
 
     def _set_neuron_connection(self, source, targets, value):
         if not (isinstance(value, int) or isinstance(value, float)):
-            value = random.random()
-        self.connections[source.index, [t.index for t in targets]] = value
+            value = self.rng.random()
+        cols = [t.index for t in targets]
+
+        # As in _set_block, the pairs lose their connections with a delay
+        for connections in self._delayed.values():
+            if connections.connected([source.index], cols):
+                connections.set(source.index, cols, 0)
+        self._connections.set(source.index, cols, value)
 
     def set_connections(self, sources, targets, value):
         if not isinstance(sources, list):
@@ -73,35 +350,102 @@ class Network:
         for n in sources:
             self._set_neuron_connection(n, targets, value)
 
+    def connect(self, listeners, senders, weights=n.DEFAULT_CONNECTION_STRENGTH, delay=0):
+        """
+        Sets the connections of all the listeners to all the senders in one call. weights
+        is a scalar, a listeners x senders matrix (numpy or scipy sparse), "random" for a
+        uniform random strength for each connection, or a distribution (see wiring.py).
+        Replaces the previous connections between them. The neurons can also be given by
+        their indices.
+
+        With a delay (in steps), the listeners get the signals of the senders from that
+        many steps before. Each distinct delay costs one more product of its connections
+        with the signals per step
+        """
+        rows, cols = to_indices(listeners), to_indices(senders)
+        if isinstance(weights, str) or callable(weights):
+            weights = wiring.draw(weights, self.rng, (len(rows), len(cols)))
+        self._set_block(rows, cols, weights, delay)
+
+    def _connect_pairs(self, rows, cols, pairs, weights, delay=0):
+        """ Connects the pairs (positions in rows and cols) and only them, with strengths drawn from weights """
+        listeners, senders = pairs
+        values = wiring.draw(weights, self.rng, len(listeners))
+        if self._connections.sparse:
+            from scipy import sparse
+            block = sparse.coo_matrix((values, (listeners, senders)), shape=(len(rows), len(cols)))
+        else:
+            block = np.zeros((len(rows), len(cols)), dtype=self.dtype)
+            block[listeners, senders] = values
+        self._set_block(rows, cols, block, delay)
+
+    def connect_all(self, listeners, senders, weights=n.DEFAULT_CONNECTION_STRENGTH, self_connections=False, delay=0):
+        """
+        Connects each listener to each sender, as connect. Unless self_connections is
+        set, the connection of a neuron to itself is set to zero
+        """
+        rows, cols = np.array(to_indices(listeners)), np.array(to_indices(senders))
+        weights = wiring.draw(weights, self.rng, (len(rows), len(cols)))
+        if not self_connections:
+            weights[rows[:, None] == cols[None, :]] = 0
+        self._set_block(rows, cols, weights, delay)
+
+    def connect_probability(self, listeners, senders, p, weights=n.DEFAULT_CONNECTION_STRENGTH, self_connections=False, delay=0):
+        """
+        Connects each listener to each sender with probability p, with strengths drawn
+        from weights (see connect). Replaces the previous connections between them
+        """
+        rows, cols = np.array(to_indices(listeners)), np.array(to_indices(senders))
+        pairs = wiring.probability_pairs(self.rng, rows, cols, p, self_connections)
+        self._connect_pairs(rows, cols, pairs, weights, delay)
+
+    def connect_in_degree(self, listeners, senders, k, weights=n.DEFAULT_CONNECTION_STRENGTH, self_connections=False, delay=0):
+        """ Connects each listener to k different senders chosen at random, as connect_probability """
+        rows, cols = np.array(to_indices(listeners)), np.array(to_indices(senders))
+        pairs = wiring.degree_pairs(self.rng, rows, cols, k, self_connections)
+        self._connect_pairs(rows, cols, pairs, weights, delay)
+
+    def connect_out_degree(self, listeners, senders, k, weights=n.DEFAULT_CONNECTION_STRENGTH, self_connections=False, delay=0):
+        """ Connects each sender to k different listeners chosen at random, as connect_probability """
+        rows, cols = np.array(to_indices(listeners)), np.array(to_indices(senders))
+        sent, listening = wiring.degree_pairs(self.rng, cols, rows, k, self_connections)
+        self._connect_pairs(rows, cols, (listening, sent), weights, delay)
+
+    def connect_distance(self, listeners, senders, positions, scale, p_max=1, weights=n.DEFAULT_CONNECTION_STRENGTH, self_connections=False, delay=0):
+        """
+        Connects each listener to each sender with probability p_max * exp(-distance / scale).
+        positions holds the position of each neuron of the network, a number or a vector
+        """
+        rows, cols = np.array(to_indices(listeners)), np.array(to_indices(senders))
+        pairs = wiring.distance_pairs(self.rng, rows, cols, positions, scale, p_max, self_connections)
+        self._connect_pairs(rows, cols, pairs, weights, delay)
+
     def update_connection_strength(self, input_n, output_n, new_value):
         input_n = self._neurons_to_indices(input_n)
         output_n = self._neurons_to_indices(output_n)
 
-        self.connections[input_n, output_n] = new_value
-        self.connections[output_n, input_n] = new_value
+        self._connections.set(input_n, output_n, new_value)
+        self._connections.set(output_n, input_n, new_value)
 
     def increase_connection_strength(self, input_n, output_n, value):
         input_n = self._neurons_to_indices(input_n)
         output_n = self._neurons_to_indices(output_n)
 
-        self.connections[input_n, output_n] += value
-        self.connections[output_n, input_n] += value
+        self._connections.add(input_n, output_n, value)
+        self._connections.add(output_n, input_n, value)
 
 
     def all_to_all_connectivity(self, neurons=None, connection_strength=0):
-        if not neurons:
-            neurons = self.neurons
-
-        for i in range(len(neurons) - 1):
-            neurons[i].listen_to(neurons[i+1], connection_strength)
-            neurons[i].send_to(neurons[i+1], connection_strength)
+        """ Connects each of neurons (all the neurons if not set) to all the others, see connect_all """
+        neurons = self.neurons if neurons is None else neurons
+        self.connect_all(neurons, neurons, connection_strength)
 
 
     def self_connections(self, neurons=None, value=0):
         neurons = neurons or self.neurons
         neurons = self._neurons_to_indices(neurons)
 
-        self.connections[neurons, neurons] = value
+        self._connections.set(neurons, neurons, value)
 
 
     def set_lifespan(self, neuron, lifespan):
@@ -113,22 +457,70 @@ class Network:
         neuron.set_lifespan(lifespan)
 
 
+    def _pattern_mask(self, pattern, neurons=None):
+        """
+        A pattern as a boolean mask over neurons (all the neurons if not set). The pattern
+        can be a mask, or the active neurons as a list of neurons or of indices
+        """
+        indices = np.arange(self.num_neurons) if neurons is None else np.array(to_indices(neurons))
+        if isinstance(pattern, np.ndarray) and pattern.dtype == bool:
+            return pattern
+
+        active = np.zeros(self.num_neurons, dtype=bool)
+        active[to_indices(pattern)] = True
+        return active[indices]
+
+    def store_patterns(self, patterns, neurons=None, strength=None, incremental=True, self_connections=False):
+        """
+        Stores patterns in the connections between neurons (all the neurons if not set)
+        with the hebbian rule: each pattern adds strength to the connection of every two
+        neurons that are in the same state (in or out of the pattern) and subtracts it from
+        the others. strength defaults to 1 / the number of patterns.
+
+        If incremental is not set, the previous connections between the neurons are
+        replaced. Unless self_connections is set, the connection of each neuron to itself
+        is set to zero, as with self_connections()
+        """
+        indices = np.arange(self.num_neurons) if neurons is None else np.array(to_indices(neurons))
+        masks = np.array([self._pattern_mask(p, neurons) for p in patterns], dtype=bool)
+        if strength is None:
+            strength = 1 / len(masks)
+
+        states = np.where(masks, 1.0, -1.0)
+        weights = strength * states.T.dot(states)
+        if not self_connections:
+            np.fill_diagonal(weights, 0)
+
+        rows, cols = indices[:, None], indices[None, :]
+        if incremental:
+            self._connections.add(rows, cols, weights)
+        else:
+            self._connections.set(rows, cols, weights)
+        if not self_connections:
+            self._connections.set(indices, indices, 0)
+
+        stored = np.zeros((len(masks), self.num_neurons), dtype=bool)
+        stored[:, indices] = masks
+        if incremental and len(self.patterns):
+            previous = np.zeros((len(self.patterns), self.num_neurons), dtype=bool)
+            previous[:, :self.patterns.shape[1]] = self.patterns
+            stored = np.concatenate([previous, stored])
+        self.patterns = stored
+
     def apply_pattern(self, pattern):
-        for neuron in self.neurons:
-            if neuron in pattern:
-                neuron.set_activation(1)
-            else:
-                neuron.set_activation(-1)
+        values = np.where(self._pattern_mask(pattern), 1, -1).tolist()
+        for neuron, value in zip(self.neurons, values):
+            neuron.set_activation(value)
 
 
     def apply_noise(self, size=0.01):
-        for neuron in self.neurons:
-            noise = (random.random() - 0.5) * size
-            neuron.set_activation(neuron.get_activation() + noise)
+        noise = ((self.rng.random(self.num_neurons) - 0.5) * size).tolist()
+        for neuron, value in zip(self.neurons, noise):
+            neuron.set_activation(neuron.get_activation() + value)
 
 
     def run(self):
-        for neuron in self.neurons:
+        for neuron in self._neurons:
             neuron.run()
 
 
@@ -136,43 +528,251 @@ class Network:
     def neuron_list(self):
         return self.neurons
 
-    def _run_and_execute(self, neurons=None, activations=None, steps=80, func=None, results=None, delta=10):
-        if not neurons:
-            neurons = self.neuron_list
+    def _simulate(self, steps=None, neurons=None, engine=None, start=0, before_step=None):
+        """
+        Runs the network, yielding the step number and the engine before each update,
+        when engine.signal holds the signals of that step. Runs until the caller
+        stops if steps is None. Steps are numbered from start, and before_step(i, engine)
+        is called before the inputs of each step are added
+        """
+        if engine is None:
+            engine = self._create_engine(neurons, steps)
+        get_inputs = self._create_input_function(engine.signal.shape)
+
+        stats, hooks = self.stats, list(self.hooks)
+        spiking = stats and self._get_plan().spiking
+        for hook in hooks:
+            hook.start(self)
 
+        try:
+            for i in itertools.count(start) if steps is None else range(start, steps):
+                if before_step is not None:
+                    before_step(i, engine)
+
+                clock = stats and time.perf_counter()
+                for hook in hooks:
+                    hook.before_step(i, engine.signal)
+                if stats and hooks:
+                    clock = stats.add("hooks", clock)
+
+                engine.add_input(engine.inputs(get_inputs))
+                if stats:
+                    stats.add("inputs", clock)
+                yield i, engine
+
+                clock = stats and time.perf_counter()
+                engine.run()
+                if stats:
+                    clock = stats.add("update", clock)
+                    stats.count(engine.signal, engine.active_count(), spiking)
+
+                for hook in hooks:
+                    hook.after_step(i, engine.signal)
+                if stats and hooks:
+                    stats.add("hooks", clock)
+        finally:
+            engine.sync()
+            for hook in hooks:
+                hook.finish()
+
+    def _run_and_execute(self, neurons=None, activations=None, steps=80, func=None, results=None, delta=10, recorder=None, observables=None, until=None, checkpoint=None, resume=None):
         if func and not results:
             results = []
 
-        self._init_activation()
+        # A resumed run starts from the saved signals, and continues the saved recording:
+        # a file recording in place, or the rows saved by the checkpoints
+        start, rows, recorded = (0, 0, None) if resume is None else resume
+        recorder = recorder or Recorder()
+        recorder.start(self, steps, rows=rows)
+        if recorded is not None:
+            recorder.restore(recorded)
+        sampler = Sampler(self, observables)
+        if until is not None:
+            until.start()
+
+        engine, before_step = None, None
+        if checkpoint is not None:
+            signal = self.activations.copy()
+            engine = self._create_engine(neurons, steps - start, random_boundary=checkpoint.every)
+            if resume is not None:
+                engine.signal[...] = signal
+
+            def save_checkpoint(i, engine):
+                if i > start and i % checkpoint.every == 0:
+                    clock = time.perf_counter()
+                    engine.sync()
+                    checkpoint.save(self, i, steps, recorder, neurons)
+                    if self.stats:
+                        self.stats.add("checkpoint", clock)
+            before_step = save_checkpoint
+
+        stats = self.stats
+        for i, engine in self._simulate(steps, neurons, engine, start, before_step):
+
+            clock = stats and time.perf_counter()
+            recorder.record(i, engine.signal)
+            sampler.step(engine.signal)
+            if i % delta == 0:
+                sampler.sample(engine.signal)
+            if stats:
+                clock = stats.add("record", clock)
+
+            if func and i % delta == 0:
+                engine.sync()
+                results.append(func(self.neurons))
+                if stats:
+                    stats.add("callback", clock)
 
-        activations = []
-        for i in range(steps):
+            if until is not None and until(i, engine.signal):
+                break
 
-            inputs = np.mat(self.connections) * np.mat(np.transpose(self.activations)).T
+        recorder.finish()
 
-            for neuron in neurons:
-                neuron.add_input(inputs[neuron.index])
+        if observables:
+            values = sampler.result()
+            if func:
+                values["func"] = results
+            return values, recorder.result()
+        if func:
+            return results, recorder.result()
+        return recorder.result()
 
-            activations.append(copy.deepcopy(self.activations))
 
-            if func and  i % delta == 0:
-                results.append(func(self.neurons))
+    def run_and_get_activations(self, neurons=None, activations=None, steps=80, recorder=None, until=None, checkpoint=None):
+        """
+        Returns the activations of each step. Pass a Recorder to select the recorded
+        neurons and how often they are recorded.
 
-            self.run()
-                
-        if func:
-            return results, np.mat(activations)
-        return np.mat(activations)
+        until is a Convergence (see convergence.py) that stops the run once the
+        activations settle, before steps. The activations then end at the step of
+        convergence, which is kept in until.step
+
+        checkpoint is a storage.Checkpoint that saves the run periodically, so that it
+        can be continued with Network.resume if it stops
+        """
+        return self._run_and_execute(neurons, activations, steps, recorder=recorder, until=until, checkpoint=checkpoint)
 
 
-    def run_and_get_activations(self, neurons=None, activations=None, steps=80):
-        return self._run_and_execute(neurons, activations, steps)
+    def run_and_get_results(self, func=None, delta=10, results=None, steps=80, recorder=None, observables=None, until=None):
+        """
+        Runs the network and samples func(neurons) every delta steps. Returns the results
+        and the activations.
 
+        observables is a dict of name: observable (see observables.py), evaluated on the
+        activations without the neuron objects. If it is set, the results are a dict of
+        the sampled values of each observable (and of func, as "func").
 
-    def run_and_get_results(self, func, delta=10, results=None, steps=80):
-        return self._run_and_execute(func=func, delta=delta, results=results, steps=steps)
+        until stops the run early, as in run_and_get_activations
+        """
+        return self._run_and_execute(func=func, delta=delta, results=results, steps=steps, recorder=recorder, observables=observables, until=until)
         
 
+    def run_ensemble(self, trials, steps=80, initial=None, noise=None, neurons=None, recorder=None, observables=None, delta=10, until=None):
+        """
+        Runs trials copies of the network together, computing the inputs of all the
+        trials with one matrix product per step. Each trial starts from the current
+        activations, or from its row of initial (trials x neurons), plus its own noise
+        of size noise as added by apply_noise. The noise and the noise neurons of each
+        trial are drawn from a generator of its own, spawned from Network.rng.
+
+        Returns the activations of each trial, trials x steps x neurons (or as selected
+        by the recorder). If observables are set, they are sampled every delta steps
+        and returned first, as in run_and_get_results, with a value per trial. The
+        neurons themselves are not changed by the run.
+
+        until stops the run once every trial converged, and keeps the step of
+        convergence of each trial in until.steps
+        """
+        if self._get_plan().populations is None:
+            raise ValueError("ensembles can only run neuron types that have a population")
+
+        recorder = recorder or Recorder()
+        recorder.start(self, steps, trials)
+        sampler = Sampler(self, observables)
+        if until is not None:
+            until.start()
+
+        engine = PopulationEngine(self, neurons, trials, steps)
+
+        activations = engine.signal.copy()
+        if initial is not None:
+            activations[...] = initial
+        if noise:
+            activations += (engine.random(self.num_neurons) - 0.5) * noise
+        engine.set_activations(activations)
+
+        stats = self.stats
+        for i, engine in self._simulate(steps, engine=engine):
+            clock = stats and time.perf_counter()
+            recorder.record(i, engine.signal)
+            sampler.step(engine.signal)
+            if i % delta == 0:
+                sampler.sample(engine.signal)
+            if stats:
+                stats.add("record", clock)
+            if until is not None and until(i, engine.signal):
+                break
+
+        recorder.finish()
+        if observables:
+            return sampler.result(), recorder.result()
+        return recorder.result()
+
+
+    def integrate(self, times, method="dopri5", dt=1, rtol=1e-6, atol=1e-9):
+        """
+        Computes the activations of a network of sigmoid neurons at times (in steps from
+        now) by integrating the dynamics that the steps follow, instead of running every
+        step. "rk4" and "dopri5" (adaptive steps, within rtol and atol) reach the same
+        trajectory with far fewer evaluations of the network when der_step is small.
+        See integrate.py.
+
+        Returns the activations at times, times x neurons. The neurons are left at the
+        activations of the last time
+        """
+        activations, final, dynamics = integrate_dynamics(self, times, method, dt, rtol, atol)
+
+        ticks = int(round(times[-1]))
+        for neuron, value in zip(self.neurons, final.tolist()):
+            neuron.set_activation(value)
+            neuron.ticks += ticks
+        self.activations = final
+        return activations
+
+
+    def iter_run(self, chunk_size=100, steps=None, neurons=None, record=None, observables=None):
+        """
+        Runs the network and yields the activations in chunks of chunk_size steps as
+        they are produced, so only one chunk is held in memory. Runs until the caller
+        stops if steps is None. record selects the recorded neurons (all if not set).
+
+        observables is a dict of name: observable (see observables.py) or
+        func(activations), evaluated on every step. If it is set, each chunk is yielded
+        as (values, activations), where values holds an array per observable
+        """
+        recorder = Recorder(record)
+        sampler = Sampler(self, observables)
+        stats = self.stats
+
+        for i, engine in self._simulate(steps, neurons):
+            row = i % chunk_size
+            if row == 0:
+                recorder.start(self, chunk_size if steps is None else min(chunk_size, steps - i))
+
+            clock = stats and time.perf_counter()
+            recorder.record(row, engine.signal)
+            sampler.step(engine.signal)
+            sampler.sample(engine.signal)
+            if stats:
+                stats.add("record", clock)
+
+            if row == chunk_size - 1 or i + 1 == steps:
+                if observables:
+                    yield sampler.result(), recorder.result()
+                else:
+                    yield recorder.result()
+
+
     def run_and_get_phases(self, neurons=None, steps=80):
 
         if not neurons:
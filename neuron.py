@@ -1,5 +1,4 @@
-import random
-import math
+import numpy as np
 
 DEFAULT_CONNECTION_STRENGTH = 1
 ACTIVATION_RANGE_HIGH = 2
@@ -125,6 +124,7 @@ class Neuron:
 
 	def show_log(self, val=True):
 		self.log = val
+		self.network.invalidate()
 		self._log("start log, name", self.name)
 
 	def get_name(self):
@@ -140,6 +140,13 @@ class Neuron:
 	def get_signal(self):
 		return self.activation
 
+	def get_resting_signal(self):
+		"""
+		The signal of the neuron whenever it does not spike, or None if it has no such
+		fixed signal
+		"""
+		return None
+
 	def add_input(self, signal):
 		self.input += signal
 
@@ -154,11 +161,36 @@ class Neuron:
 
 	def set_lifespan(self, new_value):
 		self.lifespan = new_value
+		self.network.invalidate()
 
 	def increase_connection_strength(self, neuron, value):
 		self.network.increase_connection_strength(neuron, self, value)
 
 
+class NeuronArray(list):
+	"""
+	The neurons created together by Network.create_neuron_array. It is a list of the
+	neurons, that connects to other neurons as a whole: a single call sets all the
+	connections between two arrays (see Network.connect)
+	"""
+
+	def __init__(self, network, neurons):
+		super().__init__(neurons)
+		self.network = network
+
+	@property
+	def indices(self):
+		return [x.index for x in self]
+
+	def listen_to(self, neurons, connection_strength = DEFAULT_CONNECTION_STRENGTH, delay = 0):
+		""" connection_strength is a scalar, a len(self) x len(neurons) matrix or "random" """
+		self.network.connect(self, neurons, connection_strength, delay)
+
+	def send_to(self, neurons, connection_strength = DEFAULT_CONNECTION_STRENGTH, delay = 0):
+		""" connection_strength is a scalar, a len(neurons) x len(self) matrix or "random" """
+		self.network.connect(neurons, self, connection_strength, delay)
+
+
 class ThresholdNeuron(Neuron):
 	"""
 	The threshold neuron will aggregate activation until it reaches a threshold (self.threshold)
@@ -182,6 +214,9 @@ class ThresholdNeuron(Neuron):
 		else:
 			return 0
 
+	def get_resting_signal(self):
+		return 0
+
 	def _apply_input(self):
 		if not self.in_refractory_period:
 			self.activation += self.input
@@ -214,7 +249,7 @@ class WhiteNoiseNeuron(Neuron):
 		return "WN"
 
 	def get_signal(self):
-		self.activation = random.random() * self.mean * 2
+		self.activation = self.network.rng.random() * self.mean * 2
 		return self.activation
 
 	def _internal_processes(self):
@@ -236,8 +271,11 @@ class BinaryNoiseNeuron(ThresholdNeuron):
 	def _apply_input(self):
 		pass
 
+	def get_resting_signal(self):
+		return self.range[0]
+
 	def get_signal(self):
-		signal = random.random()
+		signal = self.network.rng.random()
 		if signal < self.p :
 			self.activation = self.range[1]
 		else:
@@ -271,7 +309,7 @@ class SigmoidNeuron(Neuron):
 		pass
 
 	def _apply_input(self):
-		dif = self.bias + math.tanh(self.input + self.tanh_bias)
+		dif = self.bias + np.tanh(self.input + self.tanh_bias)
 		der = -self.activation + dif
 		self._log("input, der", self.input, dif)
 		self.activation += der * self.der_step
@@ -299,7 +337,7 @@ class LimitSigmoidNeuron(SigmoidNeuron):
 	def _apply_input(self):
 
 		if self.input != 0:
-			inpt_limit = math.tanh(self.tanh_beta * (self.input + self.tanh_bias))
+			inpt_limit = np.tanh(self.tanh_beta * (self.input + self.tanh_bias))
 			der = -self.activation + inpt_limit
 			self.activation += der * self.der_step
 			self.input = 0
@@ -0,0 +1,169 @@
+from . import neuron as n
+from .recorder import to_indices
+import numpy as np
+
+
+class Observable:
+    """
+    A value computed from the activations during a run, without the neuron objects.
+
+    start is called once when the run starts, step on every step, and the observable
+    is called with the activations of the steps on which it is sampled. Activations are
+    a vector, or a trials x neurons matrix in ensemble runs
+    """
+
+    def start(self, network):
+        self.network = network
+
+    def step(self, activations):
+        pass
+
+    def __call__(self, activations):
+        raise NotImplementedError
+
+
+class _NeuronsObservable(Observable):
+
+    def __init__(self, neurons=None):
+        self.neurons = neurons
+
+    def start(self, network):
+        super().start(network)
+        self.indices = slice(None) if self.neurons is None else np.array(to_indices(self.neurons))
+
+
+class PopulationMean(_NeuronsObservable):
+    """ The mean activation of the neurons (all the neurons if not set) """
+
+    def __call__(self, activations):
+        return activations[..., self.indices].mean(axis=-1)
+
+
+class PopulationVariance(_NeuronsObservable):
+    """ The variance of the activations of the neurons (all the neurons if not set) """
+
+    def __call__(self, activations):
+        return activations[..., self.indices].var(axis=-1)
+
+
+def _spiking(network, indices):
+    """ The spiking neurons among indices (see engine.Plan.spiking) """
+    indices = np.arange(network.num_neurons)[indices]
+    return indices[network._get_plan().spiking[indices]]
+
+
+class SpikeCount(_NeuronsObservable):
+    """
+    The number of spikes of the neurons since the previous sample: the signals of
+    SPIKE_SIZE of the spiking neurons
+    """
+
+    def start(self, network):
+        super().start(network)
+        self.spiking = _spiking(network, self.indices)
+        self.count = 0
+
+    def step(self, activations):
+        self.count = self.count + (activations[..., self.spiking] == n.SPIKE_SIZE).sum(axis=-1)
+
+    def __call__(self, activations):
+        count, self.count = self.count, 0
+        return count
+
+
+class FiringRate(Observable):
+    """
+    The fraction of the neurons of each population that spiked per step (as counted by
+    SpikeCount), averaged over the steps since the previous sample. populations is a
+    list of neuron lists
+    """
+
+    def __init__(self, populations):
+        self.populations = populations
+
+    def start(self, network):
+        super().start(network)
+        self.groups = [np.array(to_indices(p)) for p in self.populations]
+        self.spiking = network._get_plan().spiking
+        self.count = 0
+        self.steps = 0
+
+    def step(self, activations):
+        spikes = (activations == n.SPIKE_SIZE) & self.spiking
+        self.count = self.count + np.stack([spikes[..., g].mean(axis=-1) for g in self.groups], axis=-1)
+        self.steps += 1
+
+    def __call__(self, activations):
+        rate = self.count / max(self.steps, 1)
+        self.count, self.steps = 0, 0
+        return rate
+
+
+class PatternOverlap(Observable):
+    """
+    The overlap of the activations with each pattern: the mean over the neurons of the
+    activation times +1 in the pattern or -1 outside it. The patterns default to the
+    ones stored with Network.store_patterns, compared on the neurons that existed when
+    they were stored
+    """
+
+    def __init__(self, patterns=None):
+        self.patterns = patterns
+
+    def start(self, network):
+        super().start(network)
+        if self.patterns is None:
+            masks = network.patterns
+        else:
+            masks = np.array([network._pattern_mask(p) for p in self.patterns], dtype=bool)
+        self.states = np.where(masks, 1.0, -1.0)
+
+    def __call__(self, activations):
+        return activations[..., :self.states.shape[1]].dot(self.states.T) / self.states.shape[1]
+
+
+class PatternMatch(PatternOverlap):
+    """
+    The fraction of the neurons whose state matches each pattern, where a neuron with a
+    positive activation is in the pattern and any other neuron is out of it
+    """
+
+    def __call__(self, activations):
+        return (1 + super().__call__(np.where(activations > 0, 1.0, -1.0))) / 2
+
+
+class Energy(Observable):
+    """ The Hopfield energy of the activations, -1/2 a.W.a """
+
+    def __call__(self, activations):
+        return -0.5 * (activations * self.network._get_inputs(activations)).sum(axis=-1)
+
+
+class Sampler:
+    """
+    Evaluates a dict of name: observable during a run and collects the values. An
+    observable is an Observable or any func(activations)
+    """
+
+    def __init__(self, network, observables=None):
+        self.observables = observables or {}
+        for observable in self.observables.values():
+            if isinstance(observable, Observable):
+                observable.start(network)
+
+        self._stepped = [o for o in self.observables.values() if isinstance(o, Observable)]
+        self.values = {name: [] for name in self.observables}
+
+    def step(self, activations):
+        for observable in self._stepped:
+            observable.step(activations)
+
+    def sample(self, activations):
+        for name, observable in self.observables.items():
+            self.values[name].append(observable(activations))
+
+    def result(self):
+        """ The values of each observable as an array, and starts collecting anew """
+        values = {name: np.array(v) for name, v in self.values.items()}
+        self.values = {name: [] for name in self.observables}
+        return values
@@ -0,0 +1,194 @@
+from . import neuron as n
+from .connectivity import DenseConnections, SparseConnections
+from .hooks import Hook
+from .recorder import to_indices
+import numpy as np
+
+
+class Plasticity(Hook):
+    """
+    The base of the learning rules, hooks (see Network.add_hook) that change the
+    strengths of the connections after each step of the runs, from the signals of the
+    step. Only existing connections change: the nonzero strengths (or the stored ones
+    of sparse networks) when the run starts, from senders to listeners (all the neurons
+    if not set). The changes are made on the whole block of strengths at once, as
+    low-rank updates (or on the stored strengths of sparse networks), averaged over
+    the trials of ensemble runs.
+
+    If set, the strengths are kept in [w_min, w_max]. Only the connections without
+    delay learn. Requires dense or sparse connections, and runs that are not event driven
+    """
+
+    changes_connections = True
+
+    def __init__(self, listeners=None, senders=None, w_min=None, w_max=None):
+        self.listeners = listeners
+        self.senders = senders
+        self.w_min = w_min
+        self.w_max = w_max
+
+    def start(self, network):
+        super().start(network)
+        if network.event_driven:
+            raise ValueError("plasticity does not support event driven runs")
+
+        size = network.num_neurons
+        self.rows = np.arange(size) if self.listeners is None else np.array(to_indices(self.listeners))
+        self.cols = np.arange(size) if self.senders is None else np.array(to_indices(self.senders))
+        connections = network._connections
+
+        if isinstance(connections, DenseConnections):
+            self._weights = connections.matrix
+            self._mask = self._weights[np.ix_(self.rows, self.cols)] != 0
+        elif isinstance(connections, SparseConnections):
+            compressed = connections.in_place()
+            self._data = compressed.data
+            row_position, col_position = np.full(size, -1), np.full(size, -1)
+            row_position[self.rows], col_position[self.cols] = np.arange(len(self.rows)), np.arange(len(self.cols))
+
+            # The stored strengths between the listeners and senders, and the position
+            # of the listener and of the sender of each in rows and cols
+            entry_rows = row_position[np.repeat(np.arange(size), np.diff(compressed.indptr))]
+            entry_cols = col_position[compressed.indices]
+            self._entries = np.flatnonzero((entry_rows >= 0) & (entry_cols >= 0))
+            self._post, self._pre = entry_rows[self._entries], entry_cols[self._entries]
+        else:
+            raise ValueError("plasticity requires dense or sparse connections")
+
+    def finish(self):
+        self.network._connections.changed()
+
+    def after_step(self, step, signal):
+        signal = np.atleast_2d(signal)
+        self.update(signal[:, self.rows], signal[:, self.cols])
+
+    def update(self, post, pre):
+        """ Changes the strengths from the signals of the listeners and senders, trials x neurons """
+        raise NotImplementedError
+
+    def _clip(self, values):
+        if self.w_min is not None or self.w_max is not None:
+            values = np.clip(values, self.w_min, self.w_max)
+        return values
+
+    def _region(self, post_selected, pre_selected):
+        """
+        The positions in rows and cols of the selected listeners and senders, and where
+        their strengths are in the matrix (slices when all of them are selected, so the
+        strengths are changed in place)
+        """
+        positions, region = [], []
+        for selected, indices, everyone in ((post_selected, self.rows, self.listeners is None),
+                                            (pre_selected, self.cols, self.senders is None)):
+            position = slice(None) if selected is None else np.flatnonzero(selected)
+            positions.append(position)
+            region.append(slice(None, len(indices)) if everyone and selected is None else indices[position])
+        if not isinstance(region[0], slice) and not isinstance(region[1], slice):
+            region = np.ix_(*region)
+        return positions, tuple(region)
+
+    def _add(self, post, pre, scale, post_selected=None, pre_selected=None, decay=None):
+        """
+        Adds scale * post_i * pre_j (averaged over the trials) to the strength of each
+        existing connection from sender j to listener i, only for the selected
+        listeners and senders if set. If decay is set, decay_i * w_ij is subtracted too
+        """
+        if not hasattr(self, "_data"):
+            (rows, cols), region = self._region(post_selected, pre_selected)
+            weights = self._weights[region]
+            delta = scale * post[:, rows].T.dot(pre[:, cols]) / len(post)
+            if decay is not None:
+                delta -= decay[rows, None] * weights
+            mask = self._mask[rows][:, cols]
+            self._weights[region] = np.where(mask, self._clip(weights + delta), weights)
+            return
+
+        entries = np.ones(len(self._entries), dtype=bool)
+        if post_selected is not None:
+            entries &= post_selected[self._post]
+        if pre_selected is not None:
+            entries &= pre_selected[self._pre]
+        post_of, pre_of = self._post[entries], self._pre[entries]
+        stored = self._entries[entries]
+
+        delta = scale * (post[:, post_of] * pre[:, pre_of]).mean(axis=0)
+        if decay is not None:
+            delta -= decay[post_of] * self._data[stored]
+        self._data[stored] = self._clip(self._data[stored] + delta)
+
+
+class Hebbian(Plasticity):
+    """
+    Rate based hebbian learning, for networks of sigmoid neurons: each step adds
+    rate * post * pre to the strength of each connection, where post and pre are the
+    signals of the listener and of the sender
+    """
+
+    def __init__(self, rate=0.001, listeners=None, senders=None, w_min=None, w_max=None):
+        super().__init__(listeners, senders, w_min, w_max)
+        self.rate = rate
+
+    def update(self, post, pre):
+        self._add(post, pre, self.rate)
+
+
+class Oja(Plasticity):
+    """
+    Oja's rule: hebbian learning where each step also subtracts rate * post^2 * w from
+    the strength w of each connection, which keeps the strengths of a listener bounded
+    """
+
+    def __init__(self, rate=0.001, listeners=None, senders=None, w_min=None, w_max=None):
+        super().__init__(listeners, senders, w_min, w_max)
+        self.rate = rate
+
+    def update(self, post, pre):
+        self._add(post, pre, self.rate, decay=self.rate * (post ** 2).mean(axis=0))
+
+
+class STDP(Plasticity):
+    """
+    Pair based spike timing dependent plasticity, for networks of threshold neurons. A
+    spiking neuron (see engine.Plan.spiking) spikes when its signal is SPIKE_SIZE, the
+    other neurons never do. Each neuron has a presynaptic and a postsynaptic trace, that
+    add 1 on each spike and decay by exp(-1 / tau_plus) and exp(-1 / tau_minus) on each
+    step. When a listener spikes, its connections grow by a_plus times the presynaptic
+    trace of their sender, and when a sender spikes, its connections shrink by a_minus
+    times the postsynaptic trace of their listener. Spikes on the same step do not
+    change the strengths
+    """
+
+    def __init__(self, a_plus=0.01, a_minus=0.012, tau_plus=20, tau_minus=20, listeners=None, senders=None,
+                 w_min=None, w_max=None):
+        super().__init__(listeners, senders, w_min, w_max)
+        self.a_plus = a_plus
+        self.a_minus = a_minus
+        self.tau_plus = tau_plus
+        self.tau_minus = tau_minus
+
+    def start(self, network):
+        super().start(network)
+        spiking = network._get_plan().spiking
+        self.post_spiking, self.pre_spiking = spiking[self.rows], spiking[self.cols]
+        self.pre_trace = None
+        self.post_trace = None
+
+    def update(self, post, pre):
+        post_spikes = (post == n.SPIKE_SIZE) & self.post_spiking
+        pre_spikes = (pre == n.SPIKE_SIZE) & self.pre_spiking
+        if self.pre_trace is None:
+            self.pre_trace = np.zeros(pre.shape)
+            self.post_trace = np.zeros(post.shape)
+
+        self.pre_trace *= np.exp(-1 / self.tau_plus)
+        self.post_trace *= np.exp(-1 / self.tau_minus)
+
+        spiking = post_spikes.any(axis=0)
+        if spiking.any():
+            self._add(post_spikes.astype(float), self.pre_trace, self.a_plus, post_selected=spiking)
+        spiking = pre_spikes.any(axis=0)
+        if spiking.any():
+            self._add(self.post_trace, pre_spikes.astype(float), -self.a_minus, pre_selected=spiking)
+
+        self.pre_trace += pre_spikes
+        self.post_trace += post_spikes
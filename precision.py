@@ -0,0 +1,55 @@
+import time
+import numpy as np
+
+
+class PrecisionReport:
+    """
+    How far a run in a lower precision diverges from the same run in float64.
+    divergence holds the largest difference of a single activation in each step (inf
+    where only one of the runs is nan), and max_divergence and step its largest value
+    and the first step it is reached. time and reference_time are the seconds each
+    run took
+    """
+
+    def __init__(self, dtype, accumulate, reference, activations, reference_time, time):
+        self.dtype = dtype
+        self.accumulate = accumulate
+        self.reference_time = reference_time
+        self.time = time
+
+        activations = activations.astype(float)
+        both_nan = np.isnan(reference) & np.isnan(activations)
+        difference = np.where(both_nan, 0, np.abs(reference - activations))
+        self.divergence = np.nan_to_num(difference, nan=np.inf).max(axis=-1)
+
+    @property
+    def max_divergence(self):
+        return self.divergence.max().item() if len(self.divergence) else 0.0
+
+    @property
+    def step(self):
+        return int(self.divergence.argmax()) if len(self.divergence) else None
+
+    def summary(self):
+        accumulate = "" if self.accumulate is None else ", summed in {0}".format(np.dtype(self.accumulate))
+        return "{0}{1}: max divergence {2:.3g} at step {3}, {4:.3f}s against {5:.3f}s in float64".format(
+            np.dtype(self.dtype), accumulate, self.max_divergence, self.step, self.time, self.reference_time)
+
+
+def compare_precision(network, steps=80, dtype=np.float32, accumulate=None, neurons=None):
+    """
+    Runs copies of network from its current state in float64 and in dtype (summing the
+    inputs in accumulate, if set) with the same random values, and returns a
+    PrecisionReport of how far the activations of the two runs diverge. The network
+    itself is not run
+    """
+    runs = []
+    for run_dtype, run_accumulate in ((np.float64, None), (dtype, accumulate)):
+        copy = network.astype(run_dtype, run_accumulate)
+        copy.compile()
+        start = time.perf_counter()
+        activations = copy.run_and_get_activations(neurons=neurons, steps=steps)
+        runs.append((activations, time.perf_counter() - start))
+
+    (reference, reference_time), (activations, run_time) = runs
+    return PrecisionReport(np.dtype(dtype), accumulate, reference, activations, reference_time, run_time)
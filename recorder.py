@@ -0,0 +1,145 @@
+from . import neuron as n
+import json
+import os
+import numpy as np
+
+
+def to_indices(neurons):
+    """
+    The network indices of neurons, which can be a neuron, an index, or a list of
+    neurons, indices and lists of them (e.g. the arrays from create_neuron_array)
+    """
+    if isinstance(neurons, n.Neuron):
+        return [neurons.index]
+    if isinstance(neurons, (int, np.integer)):
+        return [int(neurons)]
+    if isinstance(neurons, np.ndarray) and neurons.dtype.kind in "iu":
+        return neurons.ravel().tolist()
+
+    indices = []
+    for item in neurons:
+        indices.extend(to_indices(item))
+    return indices
+
+
+class Recorder:
+    """
+    Records the activations during a run into an array that is allocated once, when
+    the run starts. Only the selected neurons are recorded (all of them if neurons
+    is not set), once every `every` steps.
+
+    If path is set, the array is a memory mapped .npy file, so recordings larger than
+    the memory can be made and reopened later with Recorder.load.
+
+    Ensemble runs are recorded per trial, and the result is trials x steps x neurons
+    """
+
+    def __init__(self, neurons=None, every=1, path=None):
+        self.neurons = neurons
+        self.every = every
+        self.path = path
+        self.indices = None
+        self.trials = None
+        self.activations = None
+        self._row = 0
+
+    def start(self, network, steps, trials=None, rows=0):
+        """
+        Allocates the recording of a run of steps steps. If rows is set, a file
+        recording is reopened and continued after its first rows (a resumed run)
+        """
+        if self.neurons is not None:
+            self.indices = np.array(to_indices(self.neurons), dtype=int)
+        columns = network.num_neurons if self.indices is None else len(self.indices)
+        length = -(-steps // self.every)
+
+        # Each row holds one step of all the trials, so a step is written in one piece
+        self.trials = trials
+        shape = (length, columns) if trials is None else (length, trials, columns)
+
+        if self.path and rows:
+            self.activations = np.load(self.path, mmap_mode="r+")
+            if self.activations.shape != shape:
+                raise ValueError("{0} does not hold the recording of the run".format(self.path))
+        elif self.path:
+            self.activations = np.lib.format.open_memmap(self.path, mode="w+", dtype=network.dtype, shape=shape)
+        else:
+            self.activations = np.empty(shape, dtype=network.dtype)
+        self._row = rows
+
+    def record(self, step, activations):
+        if step % self.every:
+            return
+
+        if self.indices is None:
+            self.activations[self._row] = activations
+        else:
+            self.activations[self._row] = activations[..., self.indices]
+        self._row += 1
+
+    def restore(self, rows):
+        """ Continues a recording whose first rows were saved (by a checkpoint) """
+        self.activations[:len(rows)] = rows
+        self._row = len(rows)
+
+    def flush(self):
+        """ Writes the rows recorded so far of a file recording to the file """
+        if self.path:
+            self.activations.flush()
+
+    def finish(self):
+        """ Called when the run ends. Flushes a file recording and writes its metadata """
+        if not self.path:
+            return
+
+        self.flush()
+        metadata = {
+            "indices": None if self.indices is None else self.indices.tolist(),
+            "every": self.every,
+            "trials": self.trials,
+            "rows": self._row,
+        }
+        with open(self._metadata_path(self.path), "w") as f:
+            json.dump(metadata, f)
+
+    @staticmethod
+    def _metadata_path(path):
+        return os.path.splitext(path)[0] + ".json"
+
+    @classmethod
+    def load(cls, path):
+        """ Reopens a file recording. The activations are read from the file only when used """
+        with open(cls._metadata_path(path)) as f:
+            metadata = json.load(f)
+
+        recorder = cls(metadata["indices"], metadata["every"], path)
+        if metadata["indices"] is not None:
+            recorder.indices = np.array(metadata["indices"], dtype=int)
+        recorder.trials = metadata["trials"]
+        recorder.activations = np.load(path, mmap_mode="r")
+        recorder._row = metadata["rows"]
+        return recorder
+
+    def result(self):
+        if self.trials is not None:
+            return np.moveaxis(self.activations[:self._row], 1, 0)
+        return self.activations[:self._row]
+
+    @property
+    def steps(self):
+        """ The step number of each recorded row """
+        return np.arange(self._row) * self.every
+
+    def column(self, neuron):
+        """ The column of the recording that holds the activations of neuron """
+        index = to_indices(neuron)[0]
+        if self.indices is None:
+            return index
+        columns = np.flatnonzero(self.indices == index)
+        if not len(columns):
+            raise ValueError("neuron {0} is not recorded".format(index))
+        return int(columns[0])
+
+    def get(self, neuron):
+        """ The recorded activations of a single neuron (of each trial, for ensembles) """
+        return self.result()[..., self.column(neuron)]
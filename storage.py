@@ -0,0 +1,263 @@
+from .connectivity import BlockConnections, SignalHistory, save_array
+import importlib
+import json
+import os
+import shutil
+import numpy as np
+
+
+def _save_json(path, data):
+    with open(path + ".tmp", "w") as f:
+        json.dump(data, f)
+    os.replace(path + ".tmp", path)
+
+
+def _neuron_table(neurons):
+    """ The attributes of neurons of a single type, as a structured array with a field per attribute """
+    names = [name for name in vars(neurons[0]) if name != "network"]
+    columns = []
+    for name in names:
+        column = np.asarray([getattr(x, name) for x in neurons])
+        if column.dtype == object:
+            raise ValueError("the attribute {0} of {1} can not be saved".format(name, type(neurons[0]).__name__))
+        columns.append(column)
+
+    table = np.empty(len(neurons), dtype=[(name, c.dtype, c.shape[1:]) for name, c in zip(names, columns)])
+    for name, column in zip(names, columns):
+        table[name] = column
+    return table
+
+
+def _create_neurons(network, ntype, table):
+    """ Neuron objects with the attributes in table, without calling their constructor """
+    columns = {name: table[name].tolist() for name in table.dtype.names}
+    neurons = []
+    for i in range(len(table)):
+        neuron = ntype.__new__(ntype)
+        neuron.__dict__.update({name: column[i] for name, column in columns.items()})
+        neuron.network = network
+        neurons.append(neuron)
+    return neurons
+
+
+def _save_connections(network, path):
+    """ Saves the connections into the directory path, those of each delay in path/delay_<steps> """
+    os.makedirs(path, exist_ok=True)
+    network._connections.save(path)
+    for delay, connections in network._delayed.items():
+        os.makedirs(os.path.join(path, "delay_{0}".format(delay)), exist_ok=True)
+        connections.save(os.path.join(path, "delay_{0}".format(delay)))
+
+
+def save_network(network, path, connections=True):
+    """
+    Saves the network into the directory path: a .npy table of the neurons of each
+    type, the activations, the connections (those of each delay in a directory
+    delay_<steps>, with the signals of the past steps) and the patterns, and the
+    options and the state of the random generator in network.json. Unless connections
+    is set, the connections are left out, and have to be loaded from where they were
+    saved
+    """
+    os.makedirs(path, exist_ok=True)
+
+    groups = {}
+    for neuron in network.neurons:
+        groups.setdefault(type(neuron), []).append(neuron)
+
+    types = []
+    for i, (ntype, members) in enumerate(groups.items()):
+        save_array(os.path.join(path, "neurons_{0}.npy".format(i)), _neuron_table(members))
+        types.append({"module": ntype.__module__, "name": ntype.__qualname__})
+
+    save_array(os.path.join(path, "activations.npy"), network.activations)
+    save_array(os.path.join(path, "patterns.npy"), network.patterns)
+    if connections:
+        _save_connections(network, path)
+    history = network._history
+    if history is not None:
+        save_array(os.path.join(path, "history.npy"), history.signals)
+
+    _save_json(os.path.join(path, "network.json"), {
+        "num_neurons": network.num_neurons,
+        "vectorized": network.vectorized,
+        "sparse": network._connections.sparse,
+        "blocks": isinstance(network._connections, BlockConnections),
+        "dtype": network.dtype.str,
+        "accumulate": None if network.accumulate is None else network.accumulate.str,
+        "event_driven": network.event_driven,
+        "delays": sorted(network._delayed),
+        "history_step": None if history is None else history.step,
+        "types": types,
+        "rng": network.rng.bit_generator.state,
+    })
+
+
+def load_network(cls, path, connections=None):
+    """
+    A network of class cls, as saved by save_network. The arrays are memory mapped. The
+    connections are loaded from the directory connections if set
+    """
+    with open(os.path.join(path, "network.json")) as f:
+        metadata = json.load(f)
+
+    network = cls(metadata["vectorized"], metadata["sparse"], metadata["event_driven"], blocks=metadata.get("blocks", False),
+                  dtype=metadata.get("dtype", "<f8"), accumulate=metadata.get("accumulate"))
+    state = metadata["rng"]
+    network.rng = np.random.Generator(getattr(np.random, state["bit_generator"])())
+    network.rng.bit_generator.state = state
+
+    network.reserve(metadata["num_neurons"])
+    neurons = [None] * metadata["num_neurons"]
+    for i, saved in enumerate(metadata["types"]):
+        ntype = importlib.import_module(saved["module"])
+        for name in saved["name"].split("."):
+            ntype = getattr(ntype, name)
+
+        table = np.load(os.path.join(path, "neurons_{0}.npy".format(i)), mmap_mode="r")
+        for neuron in _create_neurons(network, ntype, table):
+            neurons[neuron.index] = neuron
+
+    network._neurons = neurons
+    network.num_neurons = metadata["num_neurons"]
+    network.activations = np.load(os.path.join(path, "activations.npy"), mmap_mode="r")
+    network.patterns = np.load(os.path.join(path, "patterns.npy"))
+    connections = connections or path
+    network._connections.load(connections)
+    for delay in metadata.get("delays", []):
+        network._delay_group(delay).load(os.path.join(connections, "delay_{0}".format(delay)))
+    if metadata.get("history_step") is not None:
+        signals = np.load(os.path.join(path, "history.npy"))
+        network._history = SignalHistory(len(signals), signals.shape[1:], network.dtype)
+        network._history.signals[...] = signals
+        network._history.step = metadata["history_step"]
+    return network
+
+
+class Checkpoint:
+    """
+    Saves a run every `every` steps into the directory path, so that it can be resumed
+    with Network.resume(path) after it stopped. The network is saved as in save_network
+    with the signals of the step. Only the last checkpoint is kept, and it replaces
+    the previous one only once it was written completely.
+
+    The connections are saved apart, into path/connections_<step>, and only when they
+    changed since the previous checkpoint (on every checkpoint if a hook changes them,
+    see Hook.changes_connections), so later checkpoints refer to the same files.
+
+    The activations recorded into a file (Recorder with a path) are flushed and stay in
+    that file. Otherwise each checkpoint saves the rows recorded since the previous one
+    into path/recorded, so a checkpoint costs the same at any point of the run.
+
+    The resumed run records the same activations as the whole run would. Observables,
+    func and until start anew from the step of the checkpoint
+    """
+
+    def __init__(self, path, every=1000):
+        self.path = path
+        self.every = every
+
+        # The files of the rows recorded in memory that were saved, and how many rows
+        # they hold. None until the first checkpoint of a run
+        self._chunks = None
+        self._saved_rows = 0
+
+        # The directory of the saved connections, and the versions of the connections
+        # it holds
+        self._connections = None
+        self._versions = None
+
+    def resumed(self, run, network):
+        """ Continues the checkpoints of the run (as loaded by load) of network """
+        self._chunks = list(run["chunks"])
+        self._saved_rows = run["rows"]
+        self._connections = run["connections"]
+        self._versions = self._connection_versions(network)
+
+    @staticmethod
+    def _connection_versions(network):
+        """ What identifies the strengths of the connections, None if hooks change them during the runs """
+        if any(hook.changes_connections for hook in network.hooks):
+            return None
+        groups = [network._connections] + [network._delayed[d] for d in sorted(network._delayed)]
+        return [id(network), sorted(network._delayed)] + [connections.version for connections in groups]
+
+    def _save_connections(self, network, step):
+        versions = self._connection_versions(network)
+        if versions is None or versions != self._versions or self._connections is None:
+            self._connections = "connections_{0}".format(step)
+            _save_connections(network, os.path.join(self.path, self._connections))
+            self._versions = versions
+
+    def _save_rows(self, recorder):
+        recorded = os.path.join(self.path, "recorded")
+        if self._chunks is None:
+            # A new run, the rows of earlier runs in path are not used any more
+            shutil.rmtree(recorded, ignore_errors=True)
+            self._chunks, self._saved_rows = [], 0
+
+        if recorder.path:
+            recorder.flush()
+        elif recorder._row > self._saved_rows:
+            os.makedirs(recorded, exist_ok=True)
+            chunk = "rows_{0}.npy".format(self._saved_rows)
+            save_array(os.path.join(recorded, chunk), recorder.activations[self._saved_rows:recorder._row])
+            self._chunks.append(chunk)
+            self._saved_rows = recorder._row
+
+    def save(self, network, step, steps, recorder, neurons=None):
+        directory = "step_{0}".format(step)
+        if self._chunks is None:
+            # A new run, it does not refer to the connections saved by earlier runs
+            self._connections = None
+        self._save_rows(recorder)
+        self._save_connections(network, step)
+        save_network(network, os.path.join(self.path, directory, "network"), connections=False)
+        _save_json(os.path.join(self.path, directory, "run.json"), {
+            "step": step,
+            "steps": steps,
+            "every": self.every,
+            "neurons": None if neurons is None else [x.index for x in neurons],
+            "record": None if recorder.indices is None else recorder.indices.tolist(),
+            "record_every": recorder.every,
+            "record_path": recorder.path,
+            "rows": recorder._row,
+            "chunks": self._chunks,
+            "connections": self._connections,
+        })
+
+        previous = self.last(self.path)
+        _save_json(os.path.join(self.path, "checkpoint.json"), {"directory": directory})
+        if previous is not None and previous != directory:
+            shutil.rmtree(os.path.join(self.path, previous))
+        for name in os.listdir(self.path):
+            if name.startswith("connections_") and name != self._connections:
+                shutil.rmtree(os.path.join(self.path, name))
+
+    @staticmethod
+    def last(path):
+        """ The directory of the last checkpoint saved in path, None if there is none """
+        try:
+            with open(os.path.join(path, "checkpoint.json")) as f:
+                return json.load(f)["directory"]
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def load(cls, network_class, path):
+        """
+        The network, the run parameters and the activations recorded in memory of the
+        last checkpoint (None if the run records into a file, or recorded nothing yet)
+        """
+        directory = cls.last(path)
+        if directory is None:
+            raise ValueError("no checkpoint in {0}".format(path))
+
+        with open(os.path.join(path, directory, "run.json")) as f:
+            run = json.load(f)
+        network = load_network(network_class, os.path.join(path, directory, "network"),
+                               os.path.join(path, run["connections"]))
+        recorded = None
+        if run["chunks"]:
+            recorded = np.concatenate([np.load(os.path.join(path, "recorded", chunk), mmap_mode="r")
+                                       for chunk in run["chunks"]])
+        return network, run, recorded
@@ -0,0 +1,94 @@
+from multiprocessing import shared_memory
+import concurrent.futures
+import itertools
+import random
+import numpy as np
+
+# The shared arrays of the running sweep, and the shared memory blocks that hold them
+_shared = {}
+_blocks = []
+
+
+def grid_points(grid):
+    """
+    The parameter sets of a grid, given as a dict of name: list of values (all the
+    combinations are used) or as a list of dicts
+    """
+    if isinstance(grid, dict):
+        names = list(grid)
+        return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    return list(grid)
+
+
+def default_run(network):
+    return network.run_and_get_activations()
+
+
+def _share(arrays):
+    """ Copies the arrays into shared memory blocks, returns the blocks and their specs """
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def _attach(specs):
+    """ Worker initializer: maps the shared arrays as read only arrays """
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        _blocks.append(block)
+        _shared[name] = np.ndarray(shape, dtype, buffer=block.buf)
+        _shared[name].flags.writeable = False
+
+
+def _run_point(build, run, params, seed):
+    random.seed(seed)
+    network = build(**params, **_shared)
+    return run(network)
+
+
+def sweep(build, grid, run=default_run, processes=None, shared=None, seed=None):
+    """
+    Runs a network for every parameter set of grid, in a pool of processes.
+
+    build(**params, **shared) creates the network of a parameter set and run(network)
+    returns what is kept of it (the recorded activations by default, or any reduced
+    value). Large arrays used by all the networks, like a weight matrix, are passed in
+    shared: they are placed in shared memory once instead of being sent to each task.
+    build and run must be module level functions, so they can be sent to the workers.
+
+    Each parameter set gets its own random seed derived from seed, so results do not
+    depend on the worker that ran them. With processes=1 everything runs in this process.
+
+    Returns the result table: a dict per parameter set, with the parameters and "result"
+    """
+    points = grid_points(grid)
+    seeds = [int(s.generate_state(1)[0]) for s in np.random.SeedSequence(seed).spawn(len(points))]
+
+    shared = shared or {}
+    if processes == 1:
+        _shared.update(shared)
+        try:
+            results = [_run_point(build, run, p, s) for p, s in zip(points, seeds)]
+        finally:
+            _shared.clear()
+    else:
+        results = _run_in_pool(build, run, points, seeds, processes, shared)
+
+    return [dict(params, result=result) for params, result in zip(points, results)]
+
+
+def _run_in_pool(build, run, points, seeds, processes, shared):
+    blocks, specs = _share(shared)
+    try:
+        with concurrent.futures.ProcessPoolExecutor(processes, initializer=_attach, initargs=(specs,)) as pool:
+            futures = [pool.submit(_run_point, build, run, p, s) for p, s in zip(points, seeds)]
+            return [f.result() for f in futures]
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
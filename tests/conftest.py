@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The tests import the package as netsy, from the directory that holds the repository,
+# as benchmarks/benchmark.py does
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+from netsy import network as n
+from netsy.connectivity import DenseConnections
+from netsy.factory import NeuronDict as nd
+
+
+def test_dense_packing_keeps_the_strengths():
+    rng = np.random.default_rng(0)
+    connections, expected = DenseConnections(), np.zeros((0, 0))
+    for step in range(300):
+        action = rng.integers(4)
+        if action == 0:
+            size = len(expected) + int(rng.integers(1, 5))
+            grown = np.zeros((size, size))
+            grown[:len(expected), :len(expected)] = expected
+            expected = grown
+            connections.resize(size)
+        elif action == 1 and len(expected):
+            row, col = rng.integers(len(expected), size=2)
+            connections.set(row, col, step + 1)
+            expected[row, col] = step + 1
+        elif action == 2:
+            connections.compact()
+            assert connections.matrix.flags.c_contiguous
+        else:
+            connections.reserve(len(expected) + int(rng.integers(0, 20)))
+        assert np.array_equal(connections.matrix, expected)
+
+
+@pytest.mark.parametrize("storage", [{}, {"sparse": True}, {"blocks": True}])
+def test_runs_keep_the_reserved_capacity(storage):
+    net = n.Network(**storage)
+    net.create_neuron_array(ntype=nd.sigmoid, size=7)
+    net.reserve(100)
+    net.run_and_get_activations(steps=2)
+    assert net.capacity == 100
+
+    for i in range(5):
+        net.create_neuron(ntype=nd.sigmoid)
+        net.run_and_get_activations(steps=2)
+    assert net.capacity == 100
+
+
+@pytest.mark.parametrize("storage", [{"sparse": True}, {"blocks": True}, {"blocks": True, "sparse": True}])
+def test_repeated_pairs_match_dense(storage):
+    rng = np.random.default_rng(1)
+    dense, other = n.Network(), n.Network(**storage)
+    for net in (dense, other):
+        net.create_neuron_array(ntype=nd.sigmoid, size=6)
+
+    for step in range(200):
+        rows, cols = rng.integers(6, size=4), rng.integers(6, size=4)
+        rows[1], cols[1] = rows[0], cols[0]
+        values = rng.integers(-2, 3, size=4).astype(float)
+        for net in (dense, other):
+            edit = net._connections.add if step % 2 else net._connections.set
+            edit(rows, cols, values)
+        matrix = other.connections
+        assert np.array_equal(matrix if isinstance(matrix, np.ndarray) else matrix.toarray(), dense.connections)
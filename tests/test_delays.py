@@ -0,0 +1,20 @@
+import numpy as np
+import pytest
+from netsy import network as n
+from netsy.factory import NeuronDict as nd
+
+
+@pytest.mark.parametrize("storage", [{}, {"sparse": True}, {"blocks": True}, {"blocks": True, "sparse": True}])
+def test_listen_to_replaces_a_delayed_connection(storage):
+    net = n.Network(seed=0, **storage)
+    a = net.create_neuron_array(ntype=nd.sigmoid, size=2)
+    b = net.create_neuron_array(ntype=nd.sigmoid, size=2)
+    a.listen_to(b, 0.7, delay=2)
+    a[0].listen_to(b[0], 9.0)
+
+    def weight(matrix, row, col):
+        return matrix[row, col] if isinstance(matrix, np.ndarray) else matrix.toarray()[row, col]
+
+    delayed, direct = net.delayed_connections(2), net.connections
+    assert weight(direct, 0, 2) == 9.0 and weight(delayed, 0, 2) == 0
+    assert weight(direct, 1, 3) == 0 and weight(delayed, 1, 3) == 0.7
@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+from netsy import network as n
+from netsy import wiring
+from netsy.factory import NeuronDict as nd
+from netsy.hooks import Hook
+from netsy.storage import Checkpoint
+
+STORAGES = [{}, {"sparse": True}, {"event_driven": True}, {"sparse": True, "event_driven": True}, {"blocks": True},
+            {"blocks": True, "sparse": True}]
+
+
+def build(vectorized=True, lifespans=False, seed=5, **storage):
+    """ A network of every neuron type, with neurons that die if lifespans is set """
+    net = n.Network(vectorized=vectorized, seed=seed, **storage)
+    lifespan = {"lifespan": 40} if lifespans else {}
+    noise = net.create_neuron_array(ntype=nd.whitenoise, size=8, mean=0.1, range=[-0.1, 1], **lifespan)
+    binary = net.create_neuron_array(ntype=nd.binarynoise, size=5, p=0.3)
+    threshold = net.create_neuron_array(ntype=nd.threshold, size=20, **({"lifespan": 25} if lifespans else {}))
+    sigmoid = net.create_neuron_array(ntype=nd.sigmoid, size=10, tanh_bias=-0.5)
+    limited = net.create_neuron_array(ntype=nd.limsigmoid, size=4)
+
+    # Noise neurons after the others, so that the order of the draws is not that of the types
+    noise = noise + net.create_neuron_array(ntype=nd.whitenoise, size=3, mean=0.2, **lifespan)
+
+    net.connect_probability(threshold, noise + binary, 0.5, "random")
+    net.connect_probability(sigmoid, threshold + sigmoid, 0.3, wiring.Normal(0, 0.5))
+    net.connect_all(limited, sigmoid + binary, 0.2)
+    net.connect(threshold[:5], threshold[5:10], 1.5)
+    return net
+
+
+def state(net):
+    return [(x.activation, x.ticks, x.is_active, x.input) for x in net.neurons]
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_engines_give_the_same_trajectories(storage):
+    objects, populations = build(False, **storage), build(True, **storage)
+    expected = objects.run_and_get_activations(steps=100)
+    activations = populations.run_and_get_activations(steps=100)
+    assert np.array_equal(activations, expected, equal_nan=True)
+    assert state(populations) == state(objects)
+
+    # A second run continues from the same state
+    assert np.array_equal(populations.run_and_get_activations(steps=30), objects.run_and_get_activations(steps=30),
+                          equal_nan=True)
+
+
+@pytest.mark.parametrize("storage", STORAGES)
+def test_engines_with_dying_neurons(storage):
+    # Dropping the dead neurons changes the order of the sums of the inputs, so the
+    # trajectories agree up to rounding, and dead neurons stop accumulating input
+    objects, populations = build(False, lifespans=True, **storage), build(True, lifespans=True, **storage)
+    expected = objects.run_and_get_activations(steps=100)
+    activations = populations.run_and_get_activations(steps=100)
+    np.testing.assert_allclose(activations, expected, rtol=0, atol=1e-12)
+    for x, y in zip(objects.neurons, populations.neurons):
+        assert (x.ticks, x.is_active) == (y.ticks, y.is_active)
+        assert x.activation == pytest.approx(y.activation, abs=1e-12)
+
+
+class Interrupt(Hook):
+
+    def __init__(self, step):
+        self.step = step
+
+    def after_step(self, step, signal):
+        if step == self.step:
+            raise KeyboardInterrupt
+
+
+@pytest.mark.parametrize("vectorized", [False, True])
+@pytest.mark.parametrize("storage", STORAGES)
+def test_resume_gives_the_whole_run(tmp_path, storage, vectorized):
+    expected = build(vectorized, lifespans=True, **storage).run_and_get_activations(steps=100)
+
+    net = build(vectorized, lifespans=True, **storage)
+    net.add_hook(Interrupt(65))
+    with pytest.raises(KeyboardInterrupt):
+        net.run_and_get_activations(steps=100, checkpoint=Checkpoint(str(tmp_path), every=20))
+
+    network, activations = n.Network.resume(str(tmp_path))
+    assert np.array_equal(activations, expected, equal_nan=True)
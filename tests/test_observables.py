@@ -0,0 +1,22 @@
+import numpy as np
+from netsy import network as n
+from netsy.factory import NeuronDict as nd
+from netsy.observables import PatternOverlap, PatternMatch
+
+
+def test_pattern_observables_after_adding_neurons():
+    net = n.Network(seed=0)
+    neurons = net.create_neuron_array(ntype=nd.sigmoid, size=6, init=0)
+    net.store_patterns([neurons[:3], neurons[3:]])
+
+    # A readout added after the patterns were stored
+    readout = net.create_neuron_array(ntype=nd.sigmoid, size=3)
+    readout[0].listen_to(neurons, 0.1)
+
+    observables = {"overlap": PatternOverlap(), "match": PatternMatch()}
+    values, activations = net.run_and_get_results(steps=5, delta=1, observables=observables)
+
+    states = np.where(net.patterns, 1.0, -1.0)
+    assert values["overlap"].shape == (5, 2)
+    assert np.allclose(values["overlap"], activations[:, :6].dot(states.T) / 6)
+    assert np.allclose(values["match"], (1 + np.where(activations[:, :6] > 0, 1.0, -1.0).dot(states.T) / 6) / 2)
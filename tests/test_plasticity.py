@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+from netsy import network as n
+from netsy.factory import NeuronDict as nd
+from netsy.plasticity import STDP
+
+
+@pytest.mark.parametrize("sparse", [False, True])
+def test_stdp_ignores_non_spiking_senders(sparse):
+    net = n.Network(seed=0, sparse=sparse)
+    senders = net.create_neuron_array(ntype=nd.sigmoid, size=3)
+    listeners = net.create_neuron_array(ntype=nd.threshold, size=3)
+    for neuron in senders:
+        neuron.set_activation(5)
+    net.connect(senders, senders, 1.0)
+    net.connect(listeners, senders, 0.5)
+    net.add_hook(STDP())
+
+    # The sigmoid signals stay above SPIKE_SIZE, but sigmoid neurons never spike
+    activations = net.run_and_get_activations(steps=20)
+    assert activations[:, :3].min() > 3
+    weights = net.connections[3:, :3]
+    assert np.all((weights.toarray() if sparse else weights) == 0.5)
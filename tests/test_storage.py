@@ -0,0 +1,29 @@
+import os
+import numpy as np
+from netsy import network as n
+from netsy.factory import NeuronDict as nd
+from netsy.plasticity import Hebbian
+from netsy.storage import Checkpoint
+
+
+def build():
+    net = n.Network(seed=2)
+    neurons = net.create_neuron_array(ntype=nd.sigmoid, size=30)
+    net.connect_probability(neurons, neurons, 0.3, "random")
+    return net
+
+
+def test_checkpoints_save_unchanged_connections_once(tmp_path):
+    net = build()
+    net.run_and_get_activations(steps=70, checkpoint=Checkpoint(str(tmp_path), every=20))
+    assert sorted(x for x in os.listdir(tmp_path) if x.startswith("connections_")) == ["connections_20"]
+
+    loaded, activations = n.Network.resume(str(tmp_path))
+    assert np.array_equal(loaded.connections, net.connections)
+
+
+def test_checkpoints_save_connections_changed_by_hooks(tmp_path):
+    net = build()
+    net.add_hook(Hebbian())
+    net.run_and_get_activations(steps=50, checkpoint=Checkpoint(str(tmp_path), every=20))
+    assert sorted(x for x in os.listdir(tmp_path) if x.startswith("connections_")) == ["connections_40"]
@@ -0,0 +1,136 @@
+import numpy as np
+
+# The largest number of listener x sender pairs the rules that look at every pair draw
+# at once, larger networks are drawn in chunks of listeners
+CHUNK_PAIRS = 2 ** 22
+
+
+class Uniform:
+    """ Connection strengths drawn uniformly in [low, high) """
+
+    def __init__(self, low=0, high=1):
+        self.low = low
+        self.high = high
+
+    def __call__(self, rng, size):
+        return rng.uniform(self.low, self.high, size)
+
+
+class Normal:
+    """ Connection strengths drawn from a normal distribution """
+
+    def __init__(self, mean=0, std=1):
+        self.mean = mean
+        self.std = std
+
+    def __call__(self, rng, size):
+        return rng.normal(self.mean, self.std, size)
+
+
+class LogNormal:
+    """
+    Connection strengths drawn from a log-normal distribution (mean and sigma of the
+    logarithm), multiplied by sign
+    """
+
+    def __init__(self, mean=0, sigma=1, sign=1):
+        self.mean = mean
+        self.sigma = sigma
+        self.sign = sign
+
+    def __call__(self, rng, size):
+        return self.sign * rng.lognormal(self.mean, self.sigma, size)
+
+
+def draw(weights, rng, size):
+    """
+    size connection strengths: weights is a scalar, "random" for uniform strengths in
+    [0, 1), or a distribution, called with the random generator and the size
+    """
+    if isinstance(weights, str):
+        return rng.random(size)
+    if callable(weights):
+        return np.asarray(weights(rng, size), dtype=float)
+    return np.full(size, weights, dtype=float)
+
+
+def _chunks(listeners, senders):
+    step = max(1, CHUNK_PAIRS // max(1, len(senders)))
+    for start in range(0, len(listeners), step):
+        yield start, listeners[start:start + step]
+
+
+def _pairs_where(connected, listeners, senders, self_connections):
+    """
+    The (listener, sender) positions of the pairs that are connected, where
+    connected(chunk) is a mask of the pairs of a chunk of listeners with all the senders
+    """
+    rows, cols = [], []
+    for start, chunk in _chunks(listeners, senders):
+        mask = connected(chunk)
+        if not self_connections:
+            mask &= chunk[:, None] != senders[None, :]
+        r, c = np.nonzero(mask)
+        rows.append(r + start)
+        cols.append(c)
+    return np.concatenate(rows + [[]]).astype(int), np.concatenate(cols + [[]]).astype(int)
+
+
+def probability_pairs(rng, listeners, senders, p, self_connections=False):
+    """ Each listener listens to each sender with probability p """
+    return _pairs_where(lambda chunk: rng.random((len(chunk), len(senders))) < p,
+                        listeners, senders, self_connections)
+
+
+def distance_pairs(rng, listeners, senders, positions, scale, p_max=1, self_connections=False):
+    """
+    Each listener listens to each sender with probability p_max * exp(-distance / scale),
+    where positions holds the position of every neuron of the network (a number or a
+    vector for each)
+    """
+    positions = np.asarray(positions, dtype=float)
+    if positions.ndim == 1:
+        positions = positions[:, None]
+    sender_positions = positions[senders]
+
+    def connected(chunk):
+        distance = np.sqrt(((positions[chunk][:, None, :] - sender_positions[None, :, :]) ** 2).sum(axis=-1))
+        return rng.random(distance.shape) < p_max * np.exp(-distance / scale)
+
+    return _pairs_where(connected, listeners, senders, self_connections)
+
+
+def degree_pairs(rng, listeners, senders, k, self_connections=False):
+    """
+    Each listener listens to k different senders, chosen at random. Swap listeners and
+    senders (and the pairs returned) for a fixed out-degree
+    """
+    own = np.full(len(listeners), -1)
+    if not self_connections:
+        position = {index: i for i, index in enumerate(senders.tolist())}
+        own = np.array([position.get(index, -1) for index in listeners.tolist()], dtype=int)
+    available = len(senders) - (own >= 0)
+    if len(listeners) and k > available.min():
+        raise ValueError("can not choose {0} of {1} neurons".format(k, available.min()))
+
+    if 2 * k > len(senders):
+        # Most of the senders are chosen, take the first k of a random order of each row
+        keys = rng.random((len(listeners), len(senders)))
+        keys[own >= 0, own[own >= 0]] = 2
+        return np.repeat(np.arange(len(listeners)), k), np.argsort(keys, axis=1)[:, :k].ravel()
+
+    # Draw with repetitions among the senders other than the listener itself, and draw
+    # the repeated ones again
+    chosen = rng.integers(0, np.broadcast_to(available[:, None], (len(listeners), k)))
+    chosen += (own[:, None] >= 0) & (chosen >= own[:, None])
+    while True:
+        chosen.sort(axis=1)
+        repeated = np.zeros(chosen.shape, dtype=bool)
+        repeated[:, 1:] = chosen[:, 1:] == chosen[:, :-1]
+        if not repeated.any():
+            break
+        rows = np.nonzero(repeated)[0]
+        redrawn = rng.integers(0, available[rows])
+        chosen[repeated] = redrawn + ((own[rows] >= 0) & (redrawn >= own[rows]))
+
+    return np.repeat(np.arange(len(listeners)), k), chosen.ravel()